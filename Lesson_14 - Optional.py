@@ -1,8 +1,13 @@
 #Tower Defence
-import pygame, sys
+import pygame, sys, os, contextlib, random, time
+# Headless: no window, just the simulation (run with --headless, or set TD_HEADLESS=1)
+# Replays always run headless:  python "Lesson_14 - Optional.py" --replay last_game.tdr
+HEADLESS = "--headless" in sys.argv or "--replay" in sys.argv or os.environ.get("TD_HEADLESS") == "1"
+if HEADLESS:
+    os.environ["SDL_VIDEODRIVER"] = "dummy" # Lets pygame run without a screen
 pygame.init()
 pygame.font.init()
-from TowerBase import UIManager, Tile, Sprite, Timer, BaseTower, TowerType, Button, LEVEL_MAP, TOWERS, sort_path
+from TowerBase import UIManager, Tile, Sprite, bake_tiles, changed_rects, SpatialGrid, ProgressIndex, PathTrack, EnemyBatch, HAS_NUMPY, ObjectPool, FixedStep, TickCounter, Profiler, ReplayLog, load_colour_surface, AssetLoader, Timer, BaseTower, TowerType, Button, LEVEL_MAP, TOWERS, sort_path
 
 #Screen Settings
 MAP_WIDTH, MAP_HEIGHT = 600, 600 
@@ -11,13 +16,30 @@ BLOCK_SIZE = 30
 
 # Calculated settings - Dont Touch
 COLS, ROWS = MAP_WIDTH // BLOCK_SIZE, MAP_HEIGHT // BLOCK_SIZE
+GRID_CELL_SIZE = BLOCK_SIZE * 2 # Size of the cells used to find the enemies a projectile might hit
 
 #Initialisation
-screen = pygame.display.set_mode((MAP_WIDTH+UI_WIDTH, MAP_HEIGHT))
+if HEADLESS: # Images still need a (tiny, invisible) display to load
+    screen = pygame.display.set_mode((1, 1))
+else:
+    screen = pygame.display.set_mode((MAP_WIDTH+UI_WIDTH, MAP_HEIGHT))
 pygame.display.set_caption("Tower Defence")
 clock = pygame.time.Clock()
 Vector2 = pygame.math.Vector2
-FPS = 60
+FPS = 60 # Frames drawn per second
+TICK_RATE = 60 # Game updates per second (all timings below count these)
+MAX_SPEED = 0 # Game speed setting: run as many updates as fit in each frame
+GAME_SPEEDS = [1, 2, 4, MAX_SPEED] # Press F to cycle through these
+TURBO_FPS = 10 # Turbo (press T): run flat out, only drawing this many frames a second
+TURBO_BETWEEN_WAVES = False # True: use Turbo automatically while waiting for the next wave
+REPLAY_FILE = "last_game.tdr" # Each game's inputs are saved here (None = don't record)
+OFF_SCREEN = (-1, -1) # Mouse position used when there is no mouse (headless)
+DIRTY_RENDERING = False # True: only re-draw the parts of the screen that changed (faster)
+BATCH_MOVEMENT = False # True: move all enemies at once with NumPy (for huge waves)
+PROFILER = False # True: time each part of every frame, shown on the sidebar (press P)
+PROFILE_FILE = "profile.txt" # The frame timings are saved here on exit (None = don't save)
+SPRITE_ATLAS = True # True: load every image in Assets at once, pre-scaled and saved to disk (faster loading)
+ASSET_WORKERS = 4 # Threads that load images while the loading screen is shown
 
 #Modifiable Settings
 STARTING_MONEY = 500
@@ -27,12 +49,14 @@ STARTING_LIVES = 20
 ENEMY_HP = 20
 ENEMY_SPEED = 1.5
 ENEMY_BOUNTY = 10
-WAVES_BREAK = 3 * FPS # Time between waves (seconds)
-SPAWN_DELAY = 1 * FPS # Time between enemies spawning (seconds)
+WAVES_BREAK = 3 * TICK_RATE # Time between waves (seconds)
+SPAWN_DELAY = 1 * TICK_RATE # Time between enemies spawning (seconds)
 
 STARTING_ENEMIES = 5
 ENEMIES_PER_WAVE = 2
 ENEMY_HP_INCREASE = 5
+ENEMY_SPEED_INCREASE = 1.2
+ENEMY_BOUNTY_INCREASE = 2
 
 # UI Settings
 UI_BTN_SIZE = 60
@@ -44,6 +68,7 @@ BG_COLOR = (0, 0, 0) # Black background
 SIDEBAR_BG = (50, 50, 50) # Dark Grey for sidebar
 TEXT_COLOR = (255, 255, 255) # Default White Text
 ENEMY_COLOUR = (255, 0, 0) # Default Red Enemies
+ENEMY_IMAGE = "Bug_1.png"
 
 # This is how to add more tower types!
 new_towers = {
@@ -97,54 +122,157 @@ New_Level = [
     "TTTTTTTBBBBBTTTTTTTT",
 ]
 
+profiler = Profiler(enabled=PROFILER) # Times the parts of each frame (the sections are named where they're timed)
+
 def get_tile_coords(pos):
     return (int(pos[0] // BLOCK_SIZE), int(pos[1] // BLOCK_SIZE))
  
 class GameManager(UIManager):
-    def __init__(self, map_data=LEVEL_MAP):
+    def __init__(self, map_data=LEVEL_MAP, seed=None):
         super().__init__(x=0, y=0, width=MAP_WIDTH, height=MAP_HEIGHT)
+        # Same seed + same inputs = exactly the same game (used by replays)
+        self.seed = random.randrange(2**32) if seed is None else seed
+        random.seed(self.seed)
+        self.tick = 0 # Number of updates so far
+        self.recorder = ReplayLog(map_data, self.seed) # Records inputs for replays
+        
         self.money = STARTING_MONEY
         self.lives = STARTING_LIVES
         
         self.enemies = pygame.sprite.Group()
+        self.enemy_grid = SpatialGrid(GRID_CELL_SIZE) # Finds enemies by position
+        self.enemy_order = ProgressIndex() # Enemies sorted by how far along the path they are
         self.towers = pygame.sprite.Group()
+        self.projectiles = pygame.sprite.Group() # Every tower's projectiles
+        self.projectile_pool = ObjectPool(Projectile) # Spare projectiles to re-use
 
         self.spawner = EnemySpawner(self)
         self.selected_type = TOWERS["Archer"] # Default Tower
 
         self.grid = [] # The List of Tile Objects
         self.path = [] # Enemy Path Coordinates
+        self.track = None # The path measured by distance (PathTrack)
+        self.map_surface = None # Pre-rendered Tiles (built by setup_map)
+        self.drawn_rects = [] # Where the towers/enemies were drawn last frame
+        self.alpha = 1.0 # How far between the last two updates to draw moving sprites (0.0 - 1.0)
         self.setup_map(map_data)
+
+        self.batch = None # Optional: NumPy arrays that move every enemy at once
+        if BATCH_MOVEMENT:
+            if HAS_NUMPY:
+                self.batch = EnemyBatch(self.track)
+            else:
+                print("Warning: BATCH_MOVEMENT needs NumPy. Moving enemies one at a time.")
+        # Spare enemies to re-use (killed enemies go back in here)
+        self.enemy_pool = ObjectPool(BatchEnemy if self.batch else Enemy)
         
     def draw(self, screen):
         """ Draws the pre-rendered map surface onto the main screen surface. """
-        # Draw the Grid Tiles
-        for row in self.grid:
-            for tile in row:
-                tile.draw(screen)
-
+        with profiler.section("draw"):
+            # Draw the Grid Tiles (all at once)
+            screen.blit(self.map_surface, self.rect)
+            self.drawn_rects = self.draw_sprites(screen)
+    def draw_sprites(self, screen):
+        """ Draws the towers, projectiles and enemies. Returns the rects that were drawn on """
+        rects = []
         for tower in self.towers:
-            tower.draw(screen)
-    
-        self.enemies.draw(screen)
-    def update(self):
-        mouse_pos = pygame.mouse.get_pos()
-        self.towers.update(mouse_pos)
-        self.spawner.update()
-
-        # Enemy Update & Escape Check
-        for enemy in self.enemies:
-            enemy.update()
-            if enemy.breached:
-                self.enemies.remove(enemy)
-                self.lives -= 1
-                if self.lives <= 0: 
-                    print("GAME OVER")
+            rects += tower.draw(screen)
+        # Moving sprites are drawn between their last two positions (smooth at any game speed)
+        for projectile in self.projectiles:
+            rects.append(projectile.draw_smooth(screen, self.alpha))
+        if self.batch: # Work out where every enemy goes in one go
+            enemies = self.enemies.sprites()
+            centers = self.batch.smooth_centers([enemy.slot for enemy in enemies], self.alpha)
+            for enemy, center in zip(enemies, centers):
+                rects.append(screen.blit(enemy.image, enemy.image.get_rect(center=center)))
+        else:
+            for enemy in self.enemies:
+                rects.append(enemy.draw_smooth(screen, self.alpha))
+        return rects
+    def draw_dirty(self, screen):
+        """ Only re-draws around the sprites. Returns the areas of the screen that changed """
+        with profiler.section("draw"):
+            screen.set_clip(self.rect) # Don't let range circles spill onto the sidebar
+            # Cover last frame's sprites with the map
+            for rect in self.drawn_rects:
+                area = rect.move(-self.rect.x, -self.rect.y)
+                screen.blit(self.map_surface, rect, area)
+            new_rects = self.draw_sprites(screen)
+            screen.set_clip(None)
+
+        changed = changed_rects(self.drawn_rects, new_rects)
+        self.drawn_rects = new_rects
+        return [rect.clip(self.rect) for rect in changed]
+    def update(self, mouse_pos=None):
+        if mouse_pos is None:
+            mouse_pos = pygame.mouse.get_pos()
+        with profiler.section("update"):
+            self.projectiles.update() # Move all projectiles
+            with profiler.section("towers"):
+                self.towers.update(mouse_pos)
+            with profiler.section("collision"):
+                self.resolve_hits()
+            with profiler.section("spawner"):
+                self.spawner.update()
+
+            # Enemy Update & Escape Check
+            with profiler.section("enemies"):
+                if self.batch: # Move every enemy in one go
+                    self.update_batch()
+                else:
+                    for enemy in self.enemies:
+                        enemy.update()
+                        self.enemy_grid.move(enemy)
+                        if enemy.breached:
+                            self.enemy_breached(enemy)
+                
+                    # Re-sort enemies by progress (for the towers to use next frame)
+                    self.enemy_order.update(self.enemies, key=lambda enemy: enemy.progress)
+        self.tick += 1
         return self.lives > 0
+    def update_batch(self):
+        """ The same as the enemy loop in update(), but with whole-array NumPy steps (BATCH_MOVEMENT) """
+        batch = self.batch
+        batch.step()
+        # Only enemies that crossed into a new cell need moving in the grid
+        for enemy in batch.owners[batch.changed_cells(GRID_CELL_SIZE)]:
+            self.enemy_grid.move(enemy)
+        for enemy in batch.owners[batch.breached()]:
+            enemy.breached = True
+            self.enemy_breached(enemy)
+        # Re-sort enemies by progress (for the towers to use next frame)
+        order = batch.by_distance()
+        self.enemy_order.set_sorted(batch.owners[order].tolist(), batch.distance[order].tolist())
+    def enemy_breached(self, enemy):
+        """ An enemy reached the end of the path """
+        self.remove_enemy(enemy)
+        self.lives -= 1
+        if self.lives <= 0: 
+            print("GAME OVER")
+
+    def resolve_hits(self):
+        """ Checks every projectile against the enemies near it (one pass for the whole map) """
+        hits = {} # enemy -> the projectiles that hit it
+        for projectile in self.projectiles:
+            # The grid only returns enemies whose rect overlaps the projectile
+            enemies = self.enemy_grid.query_rect(projectile.rect, BLOCK_SIZE)
+            if enemies:
+                hits.setdefault(enemies[0], []).append(projectile)
+                projectile.kill() # A projectile can only hit one enemy
+
+        for enemy, projectiles_hit in hits.items():
+            # Calculate total damage
+            total_damage = sum(p.damage for p in projectiles_hit)
+            if enemy.hit(total_damage):
+                # If hit() returns True, the enemy died
+                self.remove_enemy(enemy)
+                self.money += enemy.bounty
 
     def click(self, pos):
         col, row = get_tile_coords(pos)
-        
+        self.click_tile(col, row)
+    def click_tile(self, col, row):
+        self.recorder.add(self.tick, ReplayLog.CLICK, col, row)
         print("Clicked Tile:", row, col)
         clicked_tile = self.grid[row][col]
         # SCENARIO 1: UPGRADE
@@ -158,7 +286,7 @@ class GameManager(UIManager):
             
             if self.attempt_buy(cost): 
                 # Create new tower
-                new_tower = Tower(col, row, self.selected_type)
+                new_tower = Tower(col, row, self.selected_type, manager=self)
                 self.towers.add(new_tower)
                 clicked_tile.tower = new_tower
                 print(f"Built {self.selected_type.name}")
@@ -195,37 +323,67 @@ class GameManager(UIManager):
             self.grid.append(grid_row)
             # Organize the path coordinates from Start -> End
         self.path = sort_path(path_coords, COLS, ROWS, BLOCK_SIZE)
+        self.track = PathTrack(self.path)
+        # Draw all the tiles once, then re-use the picture every frame
+        self.map_surface = bake_tiles(self.grid, self.rect.size, BG_COLOR)
+    def redraw_tile(self, tile):
+        """ Call after changing a Tile so the pre-rendered map shows it """
+        tile.draw(self.map_surface)
     def get_hovered(self):
         for tower in self.towers:
             if tower.is_hovered:
                 return tower
         return None
+    def select_type(self, tower_type):
+        """ Changes which tower gets built """
+        self.recorder.add(self.tick, ReplayLog.SELECT, list(TOWERS.values()).index(tower_type))
+        self.selected_type = tower_type
+    def save_replay(self, path):
+        """ Saves this game's inputs so run_replay() can play it again """
+        self.recorder.add(self.tick, ReplayLog.END, self.money, self.lives)
+        self.recorder.save(path)
     def is_selected(self, tower_type):
         """ Returns True if the given tower type is the one currently active. """
         if self.selected_type == tower_type:
             return True
         else:
             return False
-    def create_enemy(self, hp, speed, bounty):
-        self.enemies.add(Enemy(hp, speed, bounty, self.path))
+    def create_enemy(self, hp, speed, bounty, distance=0):
+        """ Adds an enemy 'distance' pixels along the path (0 = the start). Returns it """
+        # Re-use an old enemy if we can (saves loading its image again)
+        if self.batch:
+            enemy = self.enemy_pool.acquire(hp, speed, bounty, self.track, distance, batch=self.batch)
+        else:
+            enemy = self.enemy_pool.acquire(hp, speed, bounty, self.track, distance)
+        self.enemies.add(enemy)
+        self.enemy_grid.move(enemy)
+        return enemy
+    def remove_enemy(self, enemy):
+        self.enemies.remove(enemy)
+        self.enemy_grid.remove(enemy)
+        if self.batch: # Free up its slot in the arrays
+            self.batch.remove(enemy.slot)
+        self.enemy_pool.release(enemy)
     def get_wave_info(self):
         return self.spawner.get_info_text
 
 # Add Enemy Images (image_name="") 
 # NOTE: Assumes they are in a folder called 'Assets' (can change in TowerBase: line 9)
 class Enemy(Sprite):
-    def __init__(self, health:int, speed:float, bounty:int, path, path_index:int = 0):
-        super().__init__(0,0, BLOCK_SIZE, colour=ENEMY_COLOUR, image_name="Bug_1.png") 
+    def __init__(self, health:int, speed:float, bounty:int, track, distance:float = 0):
+        super().__init__(0,0, BLOCK_SIZE, colour=ENEMY_COLOUR, image_name=ENEMY_IMAGE) 
+        self.reset(health, speed, bounty, track, distance)
+    def reset(self, health:int, speed:float, bounty:int, track, distance:float = 0):
+        """ Sets up the enemy's stats and position (so old enemies can be re-used) """
+        #Movement Variables
+        self.track = track # The path, measured by distance (PathTrack)
+        self.distance = distance # How far along the path we are (pixels)
+        
         #Reposition enemy
-        self.pos = Vector2(path[path_index])
-        self.rect.center = (int(self.pos.x), int(self.pos.y))  
-        # NOTE: code will still work without this line (self.rect.center)
+        self.place()
+        self.last_center = self.rect.center
+        # NOTE: code will still work without this line (self.place())
         # Enemy will just spawn at topleft of screen (Update function will fix this)
-        
-        #Movement Variables
-        self.path = path
-        self.path_index = path_index
-        self.target_node = 0
 
         #Enemy Stats
         self.health = health
@@ -235,33 +393,85 @@ class Enemy(Sprite):
                 
     def update(self):
         """ Moves the enemy along the path. """
+        # Move forward - the track turns distance into a position, so we never overshoot a corner
+        self.last_center = self.rect.center
+        self.distance = min(self.distance + self.speed, self.track.total)
+        self.place()
+        
         # If enemy reached the end of the path
-        if self.target_node >= len(self.path):
+        if self.distance >= self.track.total:
             self.breached = True
-            return # Stop function to prevent crashing
-        
-        # Calculate direction to the next path node
-        target_pos = Vector2(self.path[self.target_node])
-        # Vector Math: Target - Current = Direction
-        direction = target_pos - self.pos
-       
-        # Movement Logic
-        if direction.length() > self.speed:
-            # Move towards the target at the current speed
-            self.pos += direction.normalize() * self.speed
-        else:
-            # We are close, "snap" to the node and continue to next node
-            self.pos = target_pos
-            self.target_node += 1
-            self.path_index = self.target_node
-
+    def place(self):
+        """ Moves the enemy to match self.distance """
+        self.pos = self.track.position_at(self.distance)
+        self.path_index = self.track.segment_at(self.distance) # The next path node
         # Update the visual position
         self.rect.center = (int(self.pos.x), int(self.pos.y))
-        
+
+    @property
+    def progress(self):
+        """ How far along the path we are (used to sort enemies for targeting) """
+        return self.distance
+
     def hit(self, damage):
         self.health -= damage
         return self.health <= 0 # did the enemy survive or die?
 
+class BatchEnemy(Enemy):
+    """ An Enemy whose stats live in the GameManager's EnemyBatch (NumPy arrays).
+    GameManager.update_batch moves (and draw_sprites draws) every one at once. Its rect is only updated
+    when something uses it (collisions, aiming), so enemies nobody looks at cost nothing per tick. """
+    def __init__(self, health, speed, bounty, track, distance=0, batch=None):
+        self.batch = batch
+        self.slot = None # Our index in the batch's arrays (set by reset)
+        self.placed = -1 # The batch's move count when our rect was last updated
+        super().__init__(health, speed, bounty, track, distance)
+    def reset(self, health, speed, bounty, track, distance=0, batch=None):
+        if batch is not None:
+            self.batch = batch
+        self.slot = self.batch.add(distance, speed, health, self) # Get a (new) slot in the arrays
+        super().reset(health, speed, bounty, track, distance)
+
+    # These read/write the arrays, so the rest of the game can treat us like any Enemy
+    @property
+    def distance(self): return float(self.batch.distance[self.slot])
+    @distance.setter
+    def distance(self, value): self.batch.set_distance(self.slot, value)
+    @property
+    def speed(self): return float(self.batch.speed[self.slot])
+    @speed.setter
+    def speed(self, value): self.batch.speed[self.slot] = value
+    @property
+    def health(self): return float(self.batch.health[self.slot])
+    @health.setter
+    def health(self, value): self.batch.health[self.slot] = value
+    @property
+    def pos(self): return Vector2(*self.batch.pos[self.slot])
+    @property
+    def path_index(self): return int(self.batch.target[self.slot])
+    @property
+    def rect(self):
+        if self.slot is not None and self.placed != self.batch.moves: # Catch up with the batch
+            self._rect.center = self.batch.center(self.slot)
+            self.placed = self.batch.moves
+        return self._rect
+    @rect.setter
+    def rect(self, value): self._rect = value
+    @property
+    def last_center(self):
+        if self.slot is None:
+            return self._rect.center
+        return self.batch.last_center(self.slot)
+    @last_center.setter
+    def last_center(self, value):
+        if self.slot is not None:
+            self.batch.set_last_center(self.slot, value)
+
+    def update(self):
+        """ Nothing to do: GameManager.update_batch moves every enemy at once """
+    def place(self):
+        """ Nothing to do: the batch works out our position, and rect reads it """
+
 class EnemySpawner:
     def __init__(self, game_manager):
         self.manager = game_manager
@@ -301,7 +511,7 @@ class EnemySpawner:
         print(f"Wave {self.wave_number} Started!")
         
         # Increase Difficulty: Add more enemies each wave
-        self.enemies_to_spawn = STARTING_ENEMIES + (self.wave_number - 1 * ENEMIES_PER_WAVE)
+        self.enemies_to_spawn = STARTING_ENEMIES + (self.wave_number - 1) * ENEMIES_PER_WAVE
         
         # Switch State - start creating enemies
         self.state = "SPAWNING"
@@ -310,16 +520,16 @@ class EnemySpawner:
     def spawn_enemy(self):
         # Increase Difficulty!
         # NOTE: Up to students how difficult they make it and which variables they increase. 
-        # Examples:     (would be good to have values (e.g. 5, 1.2) as easy to change global variables
-        hp = ENEMY_HP + (self.wave_number -1 * 5) 
-        speed = ENEMY_SPEED + (self.wave_number -1 * 1.2)
-        bounty = ENEMY_BOUNTY + (self.wave_number -1 * 2)
+        # Examples: (the amounts are global variables, so they are easy to change)
+        hp = ENEMY_HP + (self.wave_number - 1) * ENEMY_HP_INCREASE
+        speed = ENEMY_SPEED + (self.wave_number - 1) * ENEMY_SPEED_INCREASE
+        bounty = ENEMY_BOUNTY + (self.wave_number - 1) * ENEMY_BOUNTY_INCREASE
         self.manager.create_enemy(hp, speed, bounty)
         
     @property
     def get_info_text(self):
         if self.state == "COUNTDOWN":
-            seconds_left = max(0, self.wave_timer.current_time // 60)
+            seconds_left = max(0, self.wave_timer.current_time // TICK_RATE)
             return f"Next: {seconds_left}s"
         else:
             return f"WAVE {self.wave_number}"
@@ -328,8 +538,9 @@ class EnemySpawner:
 # NOTE: Must add image_file to the TOWERS dictionary.
 # NOTE: Also assumes they are in a folder called 'Assets' (can change in TowerBase: line 9)
 class Tower(BaseTower):
-    def __init__(self, col, row, tower_type:TowerType = TOWERS["Archer"]):
+    def __init__(self, col, row, tower_type:TowerType = TOWERS["Archer"], *, manager):
         super().__init__(col, row, BLOCK_SIZE, tower_type.color, tower_type.image_file)
+        self.manager = manager # The GameManager this tower belongs to
         
         # Setup Game Variables 
         self.type = tower_type
@@ -340,62 +551,47 @@ class Tower(BaseTower):
         self.damage = tower_type.damage
         self.cooldown_timer = Timer(tower_type.cooldown_frames)
         
-        self.projectiles = pygame.sprite.Group()
+        self.coverage = [] # Parts of the path inside our range
+        self.update_coverage()
         
     def draw(self, screen):
-        """Draws the tower and its projectiles."""
+        """Draws the tower (the GameManager draws the projectiles)."""
         #Draw Range (if hovered over) 
+        rects = []
         if self.is_hovered or self.is_selected:
-            self.draw_range(screen)
+            rects.append(self.draw_range(screen))
         # Draw tower 
-        screen.blit(self.image, self.rect)
-        # Draw the tower's projectiles
-        self.projectiles.draw(screen)
+        rects.append(screen.blit(self.image, self.rect))
+        return rects
     def update(self, mouse_pos):
         super().update(mouse_pos) # Checks if mouse is hovering over us
-        self.projectiles.update() # Update all projectiles
         
         # Shooting Logic - Reloading
         self.cooldown_timer.update() 
         if not self.cooldown_timer.is_active():
-            target = self.find_target()
+            with profiler.section("targeting"):
+                target = self.find_target()
             if target:
-                self.fire(target)
+                with profiler.section("firing"):
+                    self.fire(target)
                 self.cooldown_timer.activate()
-
-        # Collision logic - did any projectiles hit any enemies
-        hits = pygame.sprite.groupcollide(game_manager.enemies, self.projectiles, False, True)
-        for enemy, projectiles_hit in hits.items():
-            # Calculate total damage
-            total_damage = sum(p.damage for p in projectiles_hit)
-            if enemy.hit(total_damage):
-                # If hit() returns True, the enemy died
-                game_manager.enemies.remove(enemy)
-                game_manager.money += enemy.bounty
+        # NOTE: Collisions are checked for every projectile at once in GameManager.resolve_hits
 
     def find_target(self):
-        """ Finds the enemy closest to the exit (highest path_index) within range. """
-        best_target = None
-        furthest_position = -1 # Position closest to the end
-        
-        # Iterate (loop) over all enemies in the game
-        for enemy in game_manager.enemies:
-            # Check distance between tower center and enemy center
-            dist = self.center_pos.distance_to(enemy.rect.center)
-            if dist <= self.range:
-                # Prioritize enemy closest to the end (highest path index)
-                if enemy.path_index > furthest_position:
-                    furthest_position = enemy.path_index
-                    best_target = enemy
-        return best_target
+        """ Finds the enemy closest to the exit within range. """
+        # The enemies are sorted by progress, so we just binary search the parts of the path we can reach
+        return self.manager.enemy_order.furthest_in(self.coverage)
+    def update_coverage(self):
+        """ Works out which parts of the path are in range (call whenever range changes) """
+        self.coverage = self.manager.track.coverage(self.center_pos, self.range)
     def fire(self, target):
         """Creates a Projectile aimed at the given target."""
         target_pos = Vector2(target.rect.center)
         # Calculate angle to point the projectile
         direction = target_pos - self.center_pos
         angle = direction.angle_to(Vector2(1, 0)) 
-        # Create Projectile
-        self.projectiles.add(Projectile(self, angle))
+        # Create Projectile, re-using an old one if we can (the GameManager moves it and checks for hits)
+        self.manager.projectiles.add(self.manager.projectile_pool.acquire(self, angle))
     
     def get_upgrade_cost(self):
         # Calculates upgrade cost based current cost and level
@@ -413,9 +609,17 @@ class Tower(BaseTower):
         self.range = self.get_upgraded_range()
         self.cooldown_timer.duration = self.get_upgraded_cooldown()
         self.level += 1
+        self.update_coverage()
 
 class Projectile(Sprite):
     def __init__(self, owner, angle):
+        stats = owner.type
+        x, y = owner.center_pos       
+        super().__init__(x, y, stats.proj_size, colour=stats.color)
+        self.pool = None # The ObjectPool that re-uses us (if any)
+        self.reset(owner, angle)
+    def reset(self, owner, angle):
+        """ Sets up the projectile for a new shot (so old projectiles can be re-used) """
         self.damage = owner.damage
         self.range_limit = owner.range
         
@@ -427,26 +631,39 @@ class Projectile(Sprite):
         
         # 3. Setup position (start at the tower's center)
         x, y = owner.center_pos       
-        super().__init__(x, y, size, colour=color)
+        self.image = load_colour_surface(color, (size, size))
+        self.rect = self.image.get_rect(x=x, y=y)
+        self.last_center = self.rect.center
         self.spawn_pos = Vector2(x, y)
-        self.pos = self.spawn_pos
+        self.pos = Vector2(x, y) # A copy: moving pos mustn't move spawn_pos too
         self.velocity = Vector2(speed, 0).rotate(-angle)
         
     def update(self):
         # Update position
+        self.last_center = self.rect.center
         self.pos += self.velocity
         self.rect.center = (int(self.pos.x), int(self.pos.y))
 
         # Destroy if it flew too far
         if self.pos.distance_to(self.spawn_pos) > self.range_limit:
             self.kill() # Remove sprite from all groups
+    def kill(self):
+        """ Removes the projectile from all groups, and hands it back to its pool """
+        if self.pool and self.alive():
+            self.pool.release(self)
+        super().kill()
 
 class Interface(UIManager):
     def __init__(self, game_manager):
         super().__init__(MAP_WIDTH, 0, UI_WIDTH, MAP_HEIGHT)
         self.font = pygame.font.SysFont(None, 24)
+        self.small_font = pygame.font.SysFont(None, 18) # For the profiler
         self.manager = game_manager
+        self.speed = 1 # Game speed (set by the main loop)
+        self.turbo = False
+        self.tick_rate = 0 # Game updates per real second (set by the main loop)
         self.buttons = []
+        self.button_rects = [] # Where each button (and its price) was last drawn
         self.create_buttons()
 
     def update(self):
@@ -456,6 +673,9 @@ class Interface(UIManager):
         return True
             
     def draw(self, screen):
+        with profiler.section("interface"):
+            self.draw_sidebar(screen)
+    def draw_sidebar(self, screen):
         # Sidebar Background
         pygame.draw.rect(screen, SIDEBAR_BG, self.rect)
         
@@ -463,27 +683,65 @@ class Interface(UIManager):
         money = self.manager.money
         self.draw_text(screen, f"Money: ${money}", (20, 20))
         self.draw_text(screen, f"Lives: {self.manager.lives}", (20, 60))
+        if self.turbo:
+            speed_text = "TURBO"
+        elif self.speed == MAX_SPEED:
+            speed_text = "MAX"
+        else:
+            speed_text = f"{self.speed}x"
+        self.draw_text(screen, f"Speed: {speed_text} (F)", (20, 90))
         
         # Build Buttons
         self.draw_text(screen, "TOWERS", (UI_WIDTH//2, 120), center=True)
-        for btn in self.buttons:
-            btn.draw(screen, money)
+        self.button_rects = [btn.draw(screen, money) for btn in self.buttons]
 
-        # Info Panel
+        # Info Panel (or the frame timings, while profiling)
         item_to_draw = self.manager.get_hovered() or self.manager.selected_type
-        if item_to_draw:
+        if profiler.enabled:
+            self.draw_profiler(screen)
+        elif item_to_draw:
             self.draw_info_panel(screen, item_to_draw, int(money))
 
+        # Updates per second (how fast the game is really running)
+        self.draw_text(screen, f"{self.tick_rate} ticks/s", (UI_WIDTH//2, 545), colour=(150, 150, 150), center=True)
+
         # Wave Info
         wave_message = self.manager.get_wave_info()
         self.draw_text(screen, wave_message,(UI_WIDTH//2, 570), colour=(255, 255, 0), center=True)
 
+    def draw_profiler(self, screen, line_height=15):
+        """ Shows how long each part of a frame takes: p50 / p95 / p99 of the recent frames, in ms """
+        self.draw_rect(screen, self.INFO_RECT, fill_colour=(30, 30, 30), border_colour=(150, 150, 150), border_width=2)
+        x, y = self.INFO_RECT.x + 8, self.INFO_RECT.y + 6
+        columns = [x + 70, x + 105, x + 140] # Where each percentile is drawn
+        for column, title in zip(columns, ["p50", "p95", "p99"]):
+            self.draw_text(screen, title, (column, y), (150, 150, 150), font=self.small_font)
+        for name in profiler.history:
+            y += line_height
+            self.draw_text(screen, name, (x, y), font=self.small_font)
+            for column, ms in zip(columns, profiler.percentiles(name)):
+                self.draw_text(screen, f"{ms:.2f}", (column, y), font=self.small_font)
+
+    def get_draw_state(self):
+        """ Everything shown on the sidebar, split into the areas that change separately.
+        If none of it changed, draw_dirty() skips drawing; otherwise only the changed areas go to the display """
+        money = self.manager.money
+        item = self.manager.get_hovered() or self.manager.selected_type
+        timings = profiler.report() if profiler.enabled else None
+        x, y = self.rect.topleft
+        state = {(x, y, UI_WIDTH, 110): (money, self.manager.lives, self.speed, self.turbo), # Stats text
+                 tuple(self.INFO_RECT.move(x, y)): (id(item), getattr(item, "level", 0), money, timings),
+                 (x, y + 530, UI_WIDTH, MAP_HEIGHT - 530): (self.tick_rate, self.manager.get_wave_info())}
+        for btn, rect in zip(self.buttons, self.button_rects):
+            state[tuple(rect)] = (btn.is_hovered, btn.is_selected, money >= btn.type.cost)
+        return state
+
     def click(self, pos):
         """  Handles UI clicks. Returns True even if no button was pressed. """
         for btn in self.buttons:
             if btn.is_clicked(pos):
                 # Update Game Logic
-                self.manager.selected_type = btn.type
+                self.manager.select_type(btn.type)
                 print(f"Selected: {btn.type.name}")
                 
                 # Update Visuals
@@ -507,42 +765,203 @@ class Interface(UIManager):
             self.buttons.append(button)
 
 
-game_manager = GameManager(New_Level) 
-interface = Interface(game_manager)
-sections = [game_manager, interface]
-playing = True
-while playing:
-    dt = clock.tick(FPS)
-    for event in pygame.event.get():
-        if event.type == pygame.QUIT:
-            playing = False
-        if event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
-            # Iterate through systems to see which one was clicked
-            for ui in sections:
-                if ui.is_clicked(event.pos):
-                    ui.click(event.pos)
-                    break # Stop checking other systems if one handled it
-
-    # Updates
-    if playing:
-        game_active = game_manager.update()
-        interface.update()
+def find_assets():
+    """ Every image the game will load: (filename, size, fallback colour), the same as load_image() takes """
+    # NOTE: Maps are drawn with colours, so they don't add any images
+    assets = [(ENEMY_IMAGE, (BLOCK_SIZE, BLOCK_SIZE), ENEMY_COLOUR)]
+    for tower_type in TOWERS.values():
+        assets.append((tower_type.image_file, (BLOCK_SIZE, BLOCK_SIZE), tower_type.color)) # On the map
+        assets.append((tower_type.image_file, (UI_BTN_SIZE, UI_BTN_SIZE), tower_type.color)) # Sidebar button
+    return assets
+
+def load_assets(loading_screen=False):
+    """ Loads every image before the game starts, on ASSET_WORKERS background threads.
+    loading_screen: keep the window responsive, drawing a progress bar. Returns False if the window was closed """
+    # Atlases at tile + button size (saved in TowerBase's CACHE_FOLDER, so later starts are quicker)
+    atlas_sizes = [(BLOCK_SIZE, BLOCK_SIZE), (UI_BTN_SIZE, UI_BTN_SIZE)] if SPRITE_ATLAS else []
+    loader = AssetLoader(find_assets(), atlas_sizes, workers=ASSET_WORKERS)
+    if not loading_screen:
+        return loader.update(timeout=None) # Wait for them all
+    font = pygame.font.SysFont(None, 36)
+    while not loader.update():
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                loader.cancel()
+                return False
+        draw_loading_screen(screen, font, loader.progress)
+        pygame.display.update()
+        clock.tick(FPS)
+    return True
+
+def draw_loading_screen(screen, font, progress):
+    screen.fill(BG_COLOR)
+    center_x, center_y = screen.get_rect().center
+    text = font.render(f"Loading... {int(progress * 100)}%", True, TEXT_COLOR)
+    screen.blit(text, text.get_rect(center=(center_x, center_y - 30)))
+    # Progress Bar: outline, then filled up to how much has loaded
+    bar = pygame.Rect(0, 0, 300, 20)
+    bar.center = (center_x, center_y + 10)
+    pygame.draw.rect(screen, TEXT_COLOR, bar, 2)
+    pygame.draw.rect(screen, TEXT_COLOR, (bar.x, bar.y, int(bar.width * progress), bar.height))
+
+def main():
+    """ Runs the game in a window until it is closed """
+    if not load_assets(loading_screen=True): # Window closed while loading
+        return
+    game_manager = GameManager(New_Level) 
+    interface = Interface(game_manager)
+    sections = [game_manager, interface]
+    playing = True
+    full_redraw = True # Dirty Rendering needs one normal frame to start from
+    stepper = FixedStep(TICK_RATE) # Decides how many updates each frame needs
+    tick_counter = TickCounter() # Measures updates per real second
+    turbo = False
+    def in_turbo():
+        waiting = TURBO_BETWEEN_WAVES and game_manager.spawner.state == "COUNTDOWN"
+        return turbo or waiting
+    while playing:
+        dt = clock.tick(FPS)
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                playing = False
+            if event.type == pygame.KEYDOWN and event.key == pygame.K_f:
+                # Cycle through the game speeds
+                next_speed = (GAME_SPEEDS.index(stepper.speed) + 1) % len(GAME_SPEEDS)
+                stepper.speed = GAME_SPEEDS[next_speed]
+                interface.speed = stepper.speed
+            if event.type == pygame.KEYDOWN and event.key == pygame.K_t:
+                turbo = not turbo
+            if event.type == pygame.KEYDOWN and event.key == pygame.K_p:
+                profiler.enabled = not profiler.enabled
+            if event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
+                # Iterate through systems to see which one was clicked
+                for ui in sections:
+                    if ui.is_clicked(event.pos):
+                        ui.click(event.pos)
+                        break # Stop checking other systems if one handled it
+
+        with profiler.section("frame"): # Everything but waiting for the next frame
+            # Updates - a fixed number per second, however long this frame took
+            if playing:
+                game_active = True
+                ticks = 0
+                if in_turbo(): # Run flat out, only stopping to draw TURBO_FPS times a second
+                    frame_end = pygame.time.get_ticks() + 1000 // TURBO_FPS
+                    while game_active and in_turbo() and pygame.time.get_ticks() < frame_end:
+                        game_active = game_manager.update()
+                        ticks += 1
+                elif stepper.speed == MAX_SPEED: # As many updates as fit in one frame
+                    frame_end = pygame.time.get_ticks() + 1000 // FPS
+                    while game_active and pygame.time.get_ticks() < frame_end:
+                        game_active = game_manager.update()
+                        ticks += 1
+                else:
+                    for _ in range(stepper.ticks_due(dt)):
+                        game_active = game_manager.update()
+                        ticks += 1
+                        if not game_active:
+                            break
+                tick_counter.add(ticks)
+            
+                if in_turbo() or stepper.speed == MAX_SPEED:
+                    game_manager.alpha = 1.0 # No smoothing: the game is running too fast to see
+                else:
+                    game_manager.alpha = stepper.alpha
+                interface.turbo = in_turbo()
+                interface.tick_rate = tick_counter.rate
+                interface.update()
         
-        if not game_active: # If update() returned False (Game Over)
-            # Reset the Game Manager (Start fresh)
-            game_manager = GameManager(New_Level) 
+                if not game_active: # If update() returned False (Game Over)
+                    if REPLAY_FILE:
+                        game_manager.save_replay(REPLAY_FILE)
+                    # Reset the Game Manager (Start fresh)
+                    game_manager = GameManager(New_Level) 
             
-            # Re-connect the Interface to the new Game Manager
-            interface.manager = game_manager 
+                    # Re-connect the Interface to the new Game Manager
+                    interface.manager = game_manager 
             
-            # Update the 'sections' list so we draw the NEW manager, not the old one
-            sections = [game_manager, interface]
-
-    # Draw the map
-    screen.fill(BG_COLOR)
-    for ui in sections:
-        ui.draw(screen)
-    pygame.display.update()
-
-pygame.quit()       
-sys.exit()
\ No newline at end of file
+                    # Update the 'sections' list so we draw the NEW manager, not the old one
+                    sections = [game_manager, interface]
+                    full_redraw = True
+
+            # Draw the map
+            if DIRTY_RENDERING and not full_redraw:
+                # Only send the changed parts of the screen to the window
+                changed = []
+                for ui in sections:
+                    changed += ui.draw_dirty(screen)
+                pygame.display.update(changed)
+            else:
+                screen.fill(BG_COLOR)
+                for ui in sections:
+                    ui.draw(screen)
+                pygame.display.update()
+                full_redraw = False
+        profiler.end_frame()
+
+    if REPLAY_FILE and game_manager.tick > 0: # Window closed: save the unfinished game too
+        game_manager.save_replay(REPLAY_FILE)
+    if PROFILE_FILE and any(profiler.history.values()): # Save the frame timings (if we profiled)
+        profiler.dump(PROFILE_FILE)
+
+def run_headless(map_data=New_Level, max_ticks=TICK_RATE * 60 * 10, on_tick=None, quiet=True, seed=None):
+    """ Runs one game with no window, mouse or fonts, as fast as possible.
+    on_tick(manager, tick) is called before every update (e.g. to build towers).
+    Returns the GameManager once the game is over or max_ticks have run. """
+    # quiet: hide the game's print() messages
+    with contextlib.redirect_stdout(None) if quiet else contextlib.nullcontext():
+        manager = GameManager(map_data, seed)
+        for tick in range(max_ticks):
+            if on_tick:
+                on_tick(manager, tick)
+            if not manager.update(OFF_SCREEN): # Game Over
+                break
+    return manager
+
+def run_replay(path, quiet=True):
+    """ Re-plays a recorded game headless, as fast as possible.
+    Returns the GameManager and a list of differences from the recording (empty = it matched) """
+    log = ReplayLog.load(path)
+    inputs = [event for event in log.events if event[1] != ReplayLog.END]
+    endings = [event for event in log.events if event[1] == ReplayLog.END]
+    next_input = 0
+    
+    def apply_inputs(manager, tick):
+        nonlocal next_input
+        while next_input < len(inputs) and inputs[next_input][0] <= tick:
+            _, kind, a, b = inputs[next_input]
+            if kind == ReplayLog.CLICK:
+                manager.click_tile(a, b)
+            elif kind == ReplayLog.SELECT:
+                manager.select_type(list(TOWERS.values())[a])
+            next_input += 1
+    
+    # Run for exactly as long as the recorded game
+    max_ticks = endings[-1][0] if endings else TICK_RATE * 60 * 60
+    manager = run_headless(log.map_data, max_ticks, apply_inputs, quiet, log.seed)
+    
+    differences = []
+    if endings:
+        end_tick, _, money, lives = endings[-1]
+        for name, recorded, replayed in (("tick", end_tick, manager.tick), ("money", money, manager.money), ("lives", lives, manager.lives)):
+            if recorded != replayed:
+                differences.append(f"{name}: recorded {recorded}, replayed {replayed}")
+    return manager, differences
+
+if __name__ == "__main__":
+    if "--replay" in sys.argv:
+        replay_path = sys.argv[sys.argv.index("--replay") + 1]
+        load_assets()
+        start = time.perf_counter()
+        result, differences = run_replay(replay_path)
+        seconds = time.perf_counter() - start
+        print(f"Replayed {result.tick} ticks in {seconds:.2f}s ({result.tick / max(seconds, 1e-9):.0f} ticks/s)")
+        print("Desync! " + "; ".join(differences) if differences else "Replay matched the recording")
+    elif HEADLESS:
+        load_assets()
+        result = run_headless()
+        print(f"Headless game finished: wave {result.spawner.wave_number}, lives {result.lives}, money ${result.money}")
+    else:
+        main()
+    pygame.quit()       
+    sys.exit()
@@ -1,13 +1,25 @@
-import pygame, os
+import pygame, os, time, struct, math, json, mmap, tempfile
+from bisect import bisect_right
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor, wait
 from dataclasses import dataclass, field
 from enum import Enum
+try: # NumPy is optional: only EnemyBatch needs it
+    import numpy as np
+except ImportError:
+    np = None
+HAS_NUMPY = np is not None
 Vector2 = pygame.math.Vector2
 Surf = pygame.surface.Surface
 Colour = tuple[int,int,int]
 Pos = tuple[int|float, int|float] | Vector2
 
 FOLDER_NAME = "Assets"
+CACHE_FOLDER = ".asset_cache" # Built files that speed up loading (safe to delete)
 GRID_LINES = True
+IMAGE_CACHE_SIZE = 128 # Max number of loaded images kept in memory
+TEXT_CACHE_SIZE = 256 # Max number of rendered pieces of text kept in memory
+RANGE_CACHE_SIZE = 16 # Max number of range circles kept in memory (big ones are ~0.5MB each)
 
 # --- COLOURs ---
 AFFORDABLE = (0, 255, 0) # Green
@@ -21,23 +33,297 @@ UNSELECTED = (0,0,0) # Black
 RANGE = (100, 100, 100, 100) # Has 4th/alpha value: transparency amount
 HIGHLIGHT = (255, 255, 255)
 # --- Helper Functions ---
-def load_colour_surface(colour:Colour, size:tuple[int,int]):
-    """ Creates a plain colored square """
-    surf = pygame.Surface(size)
-    surf.fill(colour)
+# Colour Pool: (colour, size) -> Surface
+# Plain squares never change, so every Tile/Projectile of the same colour shares one
+_colour_pool: dict[tuple, Surf] = {}
+
+def load_colour_surface(colour:Colour, size:tuple[int,int], copy=False):
+    """ Creates a plain colored square. Use copy=True if you plan to change it (e.g. set_alpha) """
+    key = (tuple(colour), tuple(size))
+    surf = _colour_pool.get(key)
+    if surf is None: # First time we've seen this colour + size
+        surf = pygame.Surface(size)
+        surf.fill(colour)
+        _colour_pool[key] = surf
+    if copy: # Give the caller their own Surface to change
+        return surf.copy()
     return surf
+# LRU Caches: an OrderedDict kept in the order items were last used (oldest first)
+def _cache_get(cache:OrderedDict, key):
+    """ Returns the cached value (None if there isn't one) and marks it as recently used """
+    value = cache.get(key)
+    if value is not None:
+        cache.move_to_end(key)
+    return value
+def _cache_put(cache:OrderedDict, key, value, max_size:int):
+    """ Stores a value, forgetting the least recently used one once there are more than max_size. Returns value """
+    cache[key] = value
+    cache.move_to_end(key)
+    if len(cache) > max_size:
+        cache.popitem(last=False)
+    return value
+# Image Cache: (filename, size, fallback_colour) -> Surface
+# NOTE: Cached images are SHARED between sprites, so don't draw onto them directly
+_image_cache: OrderedDict[tuple, Surf] = OrderedDict()
+
 def load_image(filename:str|None, size:tuple[int,int], fallback_colour:Colour):
+    """ Loads + re-sizes an image. Repeat loads return the same (cached) Surface """
+    key = (filename, tuple(size), tuple(fallback_colour))
+    image = _cache_get(_image_cache, key)
+    if image is None: # Not loaded yet
+        image = _cache_put(_image_cache, key, _load_image_file(filename, size, fallback_colour), IMAGE_CACHE_SIZE)
+    return image
+def _load_image_file(filename:str|None, size:tuple[int,int], fallback_colour:Colour):
     # No filename, use colour instead
     if not filename: 
         return load_colour_surface(fallback_colour, size)
+    # Already packed into an atlas at this size?
+    atlas = _atlases.get(tuple(size))
+    if atlas is not None and filename in atlas.images:
+        return atlas.images[filename]
+    image = decode_image(filename, size)
+    if image is None:
+        print(f"Warning: Missing '{filename}'. Using colour.")
+        return load_colour_surface(fallback_colour, size)
+    return image.convert_alpha()
+def decode_image(filename:str, size:tuple[int,int], folder:str = FOLDER_NAME) -> Surf|None:
+    """ Loads + re-sizes an image file, but doesn't convert it for the display (so any thread can call this).
+    Returns None if the file is missing or broken """
     # Get Image location
-    path = os.path.join(FOLDER_NAME, filename)
+    path = os.path.join(folder, filename)
     try: # Attempt to load image + re-sizes it to block size
-        image = pygame.image.load(path).convert_alpha()
-        return pygame.transform.scale(image, size)
+        return pygame.transform.scale(pygame.image.load(path), size)
     except (FileNotFoundError, pygame.error):
-        print(f"Warning: Missing '{filename}'. Using colour.")
-        return load_colour_surface(fallback_colour, size)
+        return None
+def clear_image_cache(filename:str|None = None):
+    """ Forgets cached images (all of them, or just one file) so they get re-loaded """
+    if filename is None:
+        _image_cache.clear()
+        return
+    for key in [key for key in _image_cache if key[0] == filename]:
+        del _image_cache[key]
+# Sprite Atlases: size -> every image in the Assets folder, pre-scaled and packed into one Surface
+# Filled by AssetLoader (which loads the saved atlases, or builds + saves them)
+_atlases: dict[tuple, "SpriteAtlas"] = {}
+
+class SpriteAtlas:
+    """ Every image in a folder, scaled to one size and packed into a single Surface.
+    'images' maps each filename to a sub-surface of it (they share the atlas' pixels) """
+    def __init__(self, surface:Surf, size:tuple[int,int], positions:dict[str, tuple[int,int]], buffer=None):
+        self.surface = surface
+        self.size = tuple(size)
+        self.positions = positions # filename -> (x, y) in the atlas
+        self.images = {name: surface.subsurface((x, y, *self.size)) for name, (x, y) in positions.items()}
+        self.buffer = buffer # The memory-mapped file the pixels live in (if loaded from disk)
+
+    @staticmethod
+    def list_images(folder:str) -> dict[str, list[int]]:
+        """ filename -> [modified time, file size] for every PNG (to tell if a saved atlas is out of date) """
+        sources = {}
+        if not os.path.isdir(folder): # No images: load_image() will use colours instead
+            return sources
+        for filename in sorted(os.listdir(folder)):
+            if filename.lower().endswith(".png"):
+                info = os.stat(os.path.join(folder, filename))
+                sources[filename] = [info.st_mtime_ns, info.st_size]
+        return sources
+
+    @classmethod
+    def build(cls, folder:str, size:tuple[int,int], decoded:dict[str, Surf|None]|None = None) -> "SpriteAtlas":
+        """ Loads + scales every PNG in the folder, packing them into a square-ish grid.
+        decoded: images already loaded + scaled by decode_image() (e.g. by an AssetLoader) """
+        decoded = decoded or {}
+        filenames = [filename for filename in cls.list_images(folder)
+                     if decoded.get(filename) is not None or filename not in decoded] # Skip ones that failed to load
+        columns = max(1, math.ceil(math.sqrt(len(filenames))))
+        rows = max(1, math.ceil(len(filenames) / columns))
+        # Same pixel format as convert_alpha() (the fastest to draw)
+        surface = pygame.Surface((columns * size[0], rows * size[1]), pygame.SRCALPHA).convert_alpha()
+        surface.fill((0, 0, 0, 0))
+        positions = {}
+        for i, filename in enumerate(filenames):
+            pos = ((i % columns) * size[0], (i // columns) * size[1])
+            image = decoded.get(filename)
+            if image is None:
+                image = decode_image(filename, size, folder)
+            if image is None: # Broken: load_image() will warn about it + use its colour
+                continue
+            image = image.convert_alpha()
+            # MAX onto the empty (all zero) atlas copies the pixels exactly, instead of blending them
+            surface.blit(image, pos, special_flags=pygame.BLEND_RGBA_MAX)
+            positions[filename] = pos
+        return cls(surface, size, positions)
+
+    @staticmethod
+    def pixel_format(surface:Surf) -> str:
+        """ The byte order of the Surface's pixels, so they can be saved + loaded without converting """
+        red, _, blue, alpha = surface.get_masks()
+        if (red, blue, alpha) == (0x00FF0000, 0x000000FF, 0xFF000000):
+            return "BGRA"
+        return "RGBA" # Anything else gets converted to this when saved
+    @staticmethod
+    def cache_paths(cache_folder:str, size:tuple[int,int]) -> tuple[str, str]:
+        name = os.path.join(cache_folder, f"atlas_{size[0]}x{size[1]}")
+        return name + ".raw", name + ".json"
+    def save(self, cache_folder:str, sources:dict[str, list[int]]):
+        """ Saves the atlas' raw pixels + a JSON index (its size, pixel format and where each image is) """
+        os.makedirs(cache_folder, exist_ok=True)
+        pixels_path, index_path = self.cache_paths(cache_folder, self.size)
+        pixel_format = self.pixel_format(self.surface)
+        index = {"size": self.size, "atlas_size": self.surface.get_size(), "format": pixel_format,
+                 "sources": sources, "positions": self.positions}
+        # The index is replaced last: a half-saved atlas has no (or an old) index, so isn't used
+        _replace_file(pixels_path, pygame.image.tobytes(self.surface, pixel_format))
+        _replace_file(index_path, json.dumps(index).encode())
+    @classmethod
+    def load(cls, cache_folder:str, size:tuple[int,int], sources:dict[str, list[int]]) -> "SpriteAtlas|None":
+        """ Loads a saved atlas (memory-mapped: the pixels aren't copied or decoded).
+        Returns None if there isn't one, or the images have changed since """
+        pixels_path, index_path = cls.cache_paths(cache_folder, size)
+        try:
+            with open(index_path) as file:
+                index = json.load(file)
+            if index["sources"] != sources or tuple(index["size"]) != tuple(size):
+                return None # Out of date
+            with open(pixels_path, "rb") as file:
+                # ACCESS_COPY: anything drawn onto the images changes memory only, never the file
+                buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_COPY)
+            width, height = index["atlas_size"]
+            if len(buffer) != width * height * 4: # Pixels from a different save than the index
+                return None
+            surface = pygame.image.frombuffer(buffer, tuple(index["atlas_size"]), index["format"])
+        except (OSError, ValueError, KeyError, TypeError, pygame.error):
+            return None
+        positions = {name: tuple(pos) for name, pos in index["positions"].items()}
+        return cls(surface, size, positions, buffer)
+
+def _replace_file(path:str, data:bytes):
+    """ Writes to a temporary file, then swaps it in. Games that have the old file memory-mapped keep
+    the old pixels (re-writing a mapped file in place crashes them), and nobody sees a half-written file """
+    handle, temp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".", prefix=".tmp_")
+    try:
+        with os.fdopen(handle, "wb") as file:
+            file.write(data)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.remove(temp_path)
+        raise
+
+def _save_atlas(atlas:SpriteAtlas, cache_folder:str|None, sources:dict[str, list[int]]):
+    if cache_folder:
+        try:
+            atlas.save(cache_folder, sources)
+        except (OSError, pygame.error) as error:
+            print(f"Warning: Couldn't save the sprite atlas ({error})")
+def _add_atlas(atlas:SpriteAtlas):
+    """ From now on, load_image() hands out pieces of this atlas instead of loading each file """
+    _atlases[atlas.size] = atlas
+    clear_image_cache() # Images loaded before now should come from the atlas too
+
+class AssetLoader:
+    """ Loads images on worker threads, so the window can keep drawing (e.g. a loading screen) meanwhile.
+    The threads only decode + scale: convert_alpha() needs the display, so update() finishes them on the main thread.
+    images: (filename, size, fallback colour) for each image, the same as load_image() takes
+    atlas_sizes: also build (or load the saved) SpriteAtlas at each of these sizes """
+    def __init__(self, images:list[tuple[str, tuple[int,int], Colour]], atlas_sizes:list[tuple[int,int]]|tuple = (),
+                 folder:str = FOLDER_NAME, cache_folder:str|None = CACHE_FOLDER, workers=4):
+        self.folder = folder
+        self.cache_folder = cache_folder
+        self.pool = ThreadPoolExecutor(max_workers=workers)
+        self.jobs = {} # future -> (filename, size) being decoded
+        self.decoded = {} # (filename, size) -> Surface (None = missing/broken)
+        self.finished = False
+
+        # Atlases: saved ones load straight away, the others need every image decoding
+        self.sources = SpriteAtlas.list_images(folder)
+        self.atlas_sizes = [] # Sizes still to build
+        for size in atlas_sizes:
+            size = tuple(size)
+            atlas = SpriteAtlas.load(cache_folder, size, self.sources) if cache_folder else None
+            if atlas is not None:
+                _add_atlas(atlas)
+                continue
+            self.atlas_sizes.append(size)
+            for filename in self.sources:
+                self.decode(filename, size)
+
+        # Other images: only the ones no atlas has (and we haven't already loaded)
+        self.images = []
+        for filename, size, colour in images:
+            key = (filename, tuple(size), tuple(colour))
+            if not filename or key in _image_cache or key in self.images:
+                continue
+            self.images.append(key)
+            if key[1] not in _atlases or filename not in _atlases[key[1]].images:
+                self.decode(filename, key[1])
+        self.total = len(self.jobs)
+
+    def decode(self, filename:str, size:tuple[int,int]):
+        if (filename, size) not in self.jobs.values():
+            self.jobs[self.pool.submit(decode_image, filename, size, self.folder)] = (filename, size)
+    @property
+    def progress(self) -> float:
+        """ How much has loaded (0.0 - 1.0) """
+        if self.finished or not self.total:
+            return 1.0
+        return 1 - len(self.jobs) / self.total
+
+    def update(self, timeout:float|None = 0) -> bool:
+        """ Collects the images the threads have finished (waiting up to timeout seconds; None = until they all have).
+        Once they all have, builds the atlases + caches the images. Returns True when everything has loaded """
+        if self.finished:
+            return True
+        done, _ = wait(list(self.jobs), timeout=timeout)
+        for future in done:
+            self.decoded[self.jobs.pop(future)] = future.result()
+        if self.jobs:
+            return False
+
+        for size in self.atlas_sizes:
+            decoded = {filename: self.decoded.get((filename, size)) for filename in self.sources}
+            atlas = SpriteAtlas.build(self.folder, size, decoded)
+            _save_atlas(atlas, self.cache_folder, self.sources)
+            _add_atlas(atlas)
+        for key in self.images:
+            filename, size, colour = key
+            image = self.decoded.get((filename, size))
+            atlas = _atlases.get(size)
+            if image is None or (atlas is not None and filename in atlas.images):
+                load_image(filename, size, colour) # In an atlas (a piece of it), or missing (its colour)
+            else:
+                _cache_put(_image_cache, key, image.convert_alpha(), IMAGE_CACHE_SIZE)
+        self.pool.shutdown()
+        self.finished = True
+        return True
+    def cancel(self):
+        """ Stops loading (e.g. the window was closed) """
+        self.pool.shutdown(wait=False, cancel_futures=True)
+        self.jobs.clear()
+# Text Cache: (text, colour, font, antialias) -> Surface
+# Most UI text (prices, "Lives: 20"...) is the same every frame, so each is only rendered once
+_text_cache: OrderedDict[tuple, Surf] = OrderedDict()
+
+def render_text(font:pygame.font.Font, text:str, colour:Colour, antialias=True) -> Surf:
+    """ Same as font.render(), but repeat calls return the same (cached) Surface. Don't draw onto it """
+    key = (text, tuple(colour), font, antialias)
+    surf = _cache_get(_text_cache, key)
+    if surf is None: # Not rendered yet
+        surf = _cache_put(_text_cache, key, font.render(text, antialias, colour), TEXT_CACHE_SIZE)
+    return surf
+# Range Circle Cache: (radius, colour) -> Surface
+# Towers of the same type + level share one circle. Upgrading changes the radius, so it gets a new one
+_range_cache: OrderedDict[tuple, Surf] = OrderedDict()
+
+def load_range_circle(radius:float, colour:Colour) -> Surf:
+    """ A see-through circle on a transparent square Surface (2 x radius wide). Cached: don't draw onto it """
+    key = (radius, tuple(colour))
+    surf = _cache_get(_range_cache, key)
+    if surf is None: # Not drawn yet
+        size = int(radius * 2)
+        surf = pygame.Surface((size, size), pygame.SRCALPHA)
+        pygame.draw.circle(surf, colour, (radius, radius), radius)
+        _cache_put(_range_cache, key, surf, RANGE_CACHE_SIZE)
+    return surf
     
 # --- Data Classes ---
 @dataclass
@@ -171,6 +457,343 @@ class Timer:
             return 0
         return self.current_time / self.duration
 
+class SpatialGrid:
+    """ Splits the map into square cells, so we only need to check sprites that are nearby. """
+    def __init__(self, cell_size:int):
+        self.cell_size = cell_size
+        # cell -> sprites inside it (dicts keep the order they were added, unlike sets)
+        self.cells: dict[tuple[int,int], dict] = {}
+        self.sprite_cells: dict = {} # sprite -> the cell it is in
+    def __len__(self): return len(self.sprite_cells)
+
+    def get_cell(self, pos:Pos) -> tuple[int,int]:
+        return (int(pos[0] // self.cell_size), int(pos[1] // self.cell_size))
+    def move(self, sprite:pygame.sprite.Sprite):
+        """ Adds the sprite, or moves it to a new cell if it has moved (uses rect.center) """
+        cell = self.get_cell(sprite.rect.center) # type: ignore
+        old_cell = self.sprite_cells.get(sprite)
+        if cell == old_cell: 
+            return # Still in the same cell
+        if old_cell is not None:
+            self._remove_from_cell(sprite, old_cell)
+        self.cells.setdefault(cell, {})[sprite] = None
+        self.sprite_cells[sprite] = cell
+    def remove(self, sprite:pygame.sprite.Sprite):
+        cell = self.sprite_cells.pop(sprite, None)
+        if cell is not None:
+            self._remove_from_cell(sprite, cell)
+    def _remove_from_cell(self, sprite, cell):
+        sprites = self.cells[cell]
+        del sprites[sprite]
+        if not sprites: # Forget empty cells
+            del self.cells[cell]
+    def clear(self):
+        self.cells.clear()
+        self.sprite_cells.clear()
+
+    def query_rect(self, rect:pygame.Rect, sprite_size:int) -> list:
+        """ Returns every sprite whose rect overlaps rect. sprite_size: width of the biggest sprite """
+        # A sprite can only overlap if its centre is within half its size of the rect
+        half = sprite_size / 2
+        min_col, min_row = self.get_cell((rect.left - half, rect.top - half))
+        max_col, max_row = self.get_cell((rect.right + half, rect.bottom + half))
+
+        found = []
+        for col in range(min_col, max_col + 1):
+            for row in range(min_row, max_row + 1):
+                for sprite in self.cells.get((col, row), ()):
+                    if rect.colliderect(sprite.rect):
+                        found.append(sprite)
+        return found
+
+class ProgressIndex:
+    """ Keeps sprites sorted by how far along the path they are (lowest first). """
+    def __init__(self):
+        self.sprites = []
+        self.keys = [] # Each sprite's progress, in the same order as self.sprites
+    def update(self, sprites, key):
+        """ Re-sorts the sprites. key(sprite) returns its progress along the path """
+        # Enemies rarely overtake each other, so this is almost sorted already (fast)
+        pairs = sorted(((key(sprite), sprite) for sprite in sprites), key=lambda pair: pair[0])
+        self.keys = [progress for progress, _ in pairs]
+        self.sprites = [sprite for _, sprite in pairs]
+    def set_sorted(self, sprites:list, keys:list[float]):
+        """ Same as update(), for sprites the caller has already sorted (e.g. EnemyBatch.by_distance) """
+        self.sprites = sprites
+        self.keys = keys
+    def furthest_in(self, intervals:list[tuple[float,float]]):
+        """ Returns the living sprite furthest along the path inside any (start, end) interval """
+        for start, end in reversed(intervals): # Check the interval nearest the exit first
+            # Binary search: the last sprite at or before the end of this interval
+            i = bisect_right(self.keys, end) - 1
+            while i >= 0 and self.keys[i] >= start:
+                if self.sprites[i].alive(): # Skip sprites killed since the last update
+                    return self.sprites[i]
+                i -= 1
+        return None
+
+class EnemyBatch:
+    """ Stores every enemy's distance along the path, speed and health in NumPy arrays,
+    so all of them can be moved in one step. (Needs NumPy) """
+    def __init__(self, track:"PathTrack", capacity=64):
+        if np is None:
+            raise ImportError("EnemyBatch needs NumPy: pip install numpy")
+        self.total = track.total
+        self.lengths = np.array(track.lengths, dtype=float)
+        self.nodes = np.array([(node.x, node.y) for node in track.points], dtype=float).reshape(-1, 2)
+        
+        self.distance = np.zeros(capacity) # How far along the path (pixels)
+        self.speed = np.zeros(capacity)
+        self.health = np.zeros(capacity)
+        self.pos = np.zeros((capacity, 2)) # Worked out from distance
+        self.last_pos = np.zeros((capacity, 2)) # Where each enemy was before the last step
+        self.target = np.zeros(capacity, dtype=int) # Index of the next path node
+        self.active = np.zeros(capacity, dtype=bool) # Which slots hold a living enemy
+        self.owners = np.zeros(capacity, dtype=object) # The sprite using each slot
+        self.free_slots = list(range(capacity - 1, -1, -1))
+        self.moves = 0 # Goes up whenever positions change (so sprites know their rect is out of date)
+
+    def add(self, distance:float, speed:float, health:float, owner=None) -> int:
+        """ Stores a new enemy and returns its slot (its index in the arrays) """
+        if not self.free_slots:
+            self._grow()
+        slot = self.free_slots.pop()
+        self.speed[slot] = speed
+        self.health[slot] = health
+        self.active[slot] = True
+        self.owners[slot] = owner
+        self.set_distance(slot, distance)
+        self.last_pos[slot] = self.pos[slot]
+        return slot
+    def remove(self, slot:int):
+        self.active[slot] = False
+        self.owners[slot] = None
+        self.free_slots.append(slot)
+    def set_last_center(self, slot:int, center:Pos):
+        self.last_pos[slot] = center
+    def set_distance(self, slot:int, distance:float):
+        self.distance[slot] = distance
+        self._place(np.array([slot]))
+    def _grow(self):
+        """ Doubles the size of every array """
+        old_capacity = len(self.active)
+        for name in ("distance", "speed", "health", "pos", "last_pos", "target", "active", "owners"):
+            old = getattr(self, name)
+            new = np.zeros((old_capacity * 2,) + old.shape[1:], dtype=old.dtype)
+            new[:old_capacity] = old
+            setattr(self, name, new)
+        self.free_slots.extend(range(old_capacity * 2 - 1, old_capacity - 1, -1))
+
+    def step(self):
+        """ Moves every active enemy 'speed' pixels further along the path """
+        moving = np.flatnonzero(self.active)
+        self.last_pos[moving] = self.pos[moving]
+        self.distance[moving] = np.minimum(self.distance[moving] + self.speed[moving], self.total)
+        self._place(moving)
+    def _place(self, slots):
+        """ Works out the position and next node for each slot from its distance """
+        distance = self.distance[slots]
+        self.pos[slots, 0] = np.interp(distance, self.lengths, self.nodes[:, 0])
+        self.pos[slots, 1] = np.interp(distance, self.lengths, self.nodes[:, 1])
+        next_node = np.searchsorted(self.lengths, distance, side="right")
+        self.target[slots] = np.minimum(next_node, len(self.lengths) - 1)
+        self.moves += 1
+
+    def center(self, slot:int) -> tuple[int,int]:
+        """ A slot's position in whole pixels (the same as rect.center) """
+        x, y = self.pos[slot]
+        return (int(x), int(y))
+    def last_center(self, slot:int) -> tuple[int,int]:
+        """ A slot's position before the last step, in whole pixels """
+        x, y = self.last_pos[slot]
+        return (int(x), int(y))
+    def smooth_centers(self, slots:list[int], alpha:float) -> zip:
+        """ Sprite.draw_smooth's centers for many slots at once, as (x, y).
+        Made from flat lists of ints: a list per slot would set off the garbage collector """
+        last, now = self.last_pos[slots].astype(int), self.pos[slots].astype(int)
+        drawn = (last + (now - last) * alpha).astype(int)
+        return zip(drawn[:, 0].tolist(), drawn[:, 1].tolist())
+
+    # --- Whole-batch queries (one NumPy call each, instead of a Python loop over every enemy) ---
+    def changed_cells(self, cell_size:int) -> "np.ndarray":
+        """ The active slots that moved into a different (SpatialGrid) cell in the last step """
+        slots = np.flatnonzero(self.active)
+        old = self.last_pos[slots].astype(int) // cell_size
+        new = self.pos[slots].astype(int) // cell_size
+        return slots[(old != new).any(axis=1)]
+    def breached(self) -> "np.ndarray":
+        """ The active slots that have reached the end of the path """
+        return np.flatnonzero(self.active & (self.distance >= self.total))
+    def by_distance(self) -> "np.ndarray":
+        """ The active slots, sorted by distance along the path (lowest first) """
+        slots = np.flatnonzero(self.active)
+        return slots[np.argsort(self.distance[slots], kind="stable")]
+
+class ObjectPool:
+    """ Keeps finished objects so they can be reset and reused, instead of building new ones.
+    Objects need a reset(...) method taking the same arguments as create(...). """
+    def __init__(self, create, max_size=1000):
+        self.create = create # Builds a brand new object (e.g. a class)
+        self.max_size = max_size # Most spare objects to keep
+        self.free = []
+        self.created = 0
+        self.reused = 0
+        self.in_use = 0
+
+    def acquire(self, *args, **kwargs):
+        """ Returns a reset spare object, or a new one if there are none spare """
+        if self.free:
+            obj = self.free.pop()
+            obj.reset(*args, **kwargs)
+            self.reused += 1
+        else:
+            obj = self.create(*args, **kwargs)
+            self.created += 1
+        obj.pool = self # So the object can release itself
+        self.in_use += 1
+        return obj
+    def release(self, obj):
+        """ Hands a finished object back to the pool """
+        self.in_use -= 1
+        if len(self.free) < self.max_size:
+            self.free.append(obj)
+    
+    @property
+    def stats(self) -> dict[str, int]:
+        return {"created": self.created, "reused": self.reused, 
+                "in_use": self.in_use, "free": len(self.free)}
+
+class FixedStep:
+    """ Turns real time into a whole number of fixed-length simulation ticks,
+    so the game runs at the same speed however slowly it is drawn. """
+    def __init__(self, tick_rate:int, max_frame_ms=250):
+        self.tick_ms = 1000 / tick_rate # Length of one tick
+        self.max_frame_ms = max_frame_ms # Slower frames than this are treated as this (stops runaway catch-up)
+        self.accumulator = 0.0 # Time waiting to be simulated
+        self.speed = 1 # 2 = double speed, 4 = quadruple...
+    def ticks_due(self, dt_ms:float) -> int:
+        """ Returns how many ticks to run for a frame that took dt_ms """
+        self.accumulator += min(dt_ms, self.max_frame_ms) * self.speed
+        ticks = int(self.accumulator // self.tick_ms)
+        self.accumulator -= ticks * self.tick_ms
+        return ticks
+    @property
+    def alpha(self) -> float:
+        """ How far we are between the last tick and the next one (0.0 - 1.0), for smooth drawing """
+        return self.accumulator / self.tick_ms
+
+class TickCounter:
+    """ Measures how many simulation ticks run per real (wall-clock) second. """
+    def __init__(self):
+        self.rate = 0 # Ticks in the last full second
+        self.count = 0
+        self.start = time.perf_counter()
+    def add(self, ticks:int):
+        self.count += ticks
+        elapsed = time.perf_counter() - self.start
+        if elapsed >= 1: # Once a second, work out the new rate
+            self.rate = round(self.count / elapsed)
+            self.count = 0
+            self.start = time.perf_counter()
+
+class _ProfileSection:
+    """ One named section of a Profiler, used with 'with'. Re-used every time (nothing new is created per call) """
+    __slots__ = ("profiler", "name", "start")
+    def __init__(self, profiler:"Profiler", name:str):
+        self.profiler = profiler
+        self.name = name
+        self.start = None
+    def __enter__(self):
+        self.start = time.perf_counter() if self.profiler.enabled else None
+    def __exit__(self, *exc_info):
+        if self.start is not None:
+            self.profiler.add(self.name, (time.perf_counter() - self.start) * 1000)
+
+class Profiler:
+    """ Measures how long named parts of each frame take (in ms), e.g.
+        with profiler.section("draw"):
+            ...
+    Call end_frame() once per frame. The last 'window' frames are kept to work out percentiles.
+    Costs almost nothing while enabled is False. """
+    def __init__(self, window=300, enabled=False):
+        self.enabled = enabled
+        self.window = window
+        self.frame_totals = {} # name -> ms spent so far this frame
+        self.history = {} # name -> ms spent in each of the last 'window' frames
+        self.sections = {} # name -> _ProfileSection
+    def section(self, name:str) -> _ProfileSection:
+        section = self.sections.get(name)
+        if section is None: # First use: the report lists sections in this order
+            section = self.sections[name] = _ProfileSection(self, name)
+            self.history[name] = deque(maxlen=self.window)
+        return section
+    def add(self, name:str, ms:float):
+        self.frame_totals[name] = self.frame_totals.get(name, 0.0) + ms
+    def end_frame(self):
+        """ Stores this frame's totals. Sections that didn't run this frame count as 0 ms """
+        if self.enabled:
+            for name, frames in self.history.items():
+                frames.append(self.frame_totals.get(name, 0.0))
+        self.frame_totals = {}
+    def percentiles(self, name:str, points=(50, 95, 99)) -> list[float]:
+        """ The (nearest-rank) percentiles of a section's frame times, in ms """
+        frames = sorted(self.history.get(name, ()))
+        if not frames:
+            return [0.0 for _ in points]
+        return [frames[max(0, math.ceil(point / 100 * len(frames)) - 1)] for point in points]
+    def report(self) -> list[str]:
+        """ One line per section: name, p50 / p95 / p99 in ms """
+        lines = []
+        for name in self.history:
+            p50, p95, p99 = self.percentiles(name)
+            lines.append(f"{name:<10} {p50:6.2f} {p95:6.2f} {p99:6.2f}")
+        return lines
+    def dump(self, path:str):
+        """ Writes the report (plus the worst frame for each section) to a text file """
+        with open(path, "w") as file:
+            file.write(f"Frame times in ms over the last {self.window} frames\n")
+            file.write(f"{'section':<10} {'p50':>6} {'p95':>6} {'p99':>6} {'max':>6}\n")
+            for name, line in zip(self.history, self.report()):
+                file.write(f"{line} {max(self.history[name], default=0.0):6.2f}\n")
+
+class ReplayLog:
+    """ A compact binary record of one game's inputs (plus its map and random seed),
+    so the game can be re-played exactly, e.g. headless to find a bug or slowdown. """
+    MAGIC = b"TDRP"
+    VERSION = 1
+    HEADER = struct.Struct("<4sBII") # magic, version, seed, length of the map text
+    EVENT = struct.Struct("<IBii")   # tick, kind, a, b
+    # Kinds of event
+    CLICK = 1  # Clicked map tile: a = col, b = row
+    SELECT = 2 # Chose a tower type: a = its position in TOWERS
+    END = 3    # Game finished: a = money, b = lives (to check the replay matches)
+
+    def __init__(self, map_data:list[str], seed:int = 0):
+        self.map_data = list(map_data)
+        self.seed = seed
+        self.events: list[tuple[int,int,int,int]] = [] # (tick, kind, a, b)
+    def add(self, tick:int, kind:int, a:int = 0, b:int = 0):
+        self.events.append((tick, kind, a, b))
+
+    def save(self, path:str):
+        map_text = "\n".join(self.map_data).encode("ascii")
+        with open(path, "wb") as file:
+            file.write(self.HEADER.pack(self.MAGIC, self.VERSION, self.seed, len(map_text)))
+            file.write(map_text)
+            for event in self.events:
+                file.write(self.EVENT.pack(*event))
+    @classmethod
+    def load(cls, path:str) -> "ReplayLog":
+        with open(path, "rb") as file:
+            data = file.read()
+        magic, version, seed, map_length = cls.HEADER.unpack_from(data)
+        if magic != cls.MAGIC or version != cls.VERSION:
+            raise ValueError(f"'{path}' is not a version {cls.VERSION} replay file")
+        start = cls.HEADER.size
+        log = cls(data[start:start + map_length].decode("ascii").split("\n"), seed)
+        log.events = list(cls.EVENT.iter_unpack(data[start + map_length:]))
+        return log
+
 class Clickable:
     def __init__(self, rect:pygame.Rect):
         self.rect = rect
@@ -192,7 +815,7 @@ class Button(Clickable):
         self.is_selected = selected
         self.image = load_image(tower_type.image_file, (size, size), tower_type.color)
         # Create Highlight 
-        self.highlight_surf = load_colour_surface(HIGHLIGHT, (size, size))
+        self.highlight_surf = load_colour_surface(HIGHLIGHT, (size, size), copy=True)
         self.highlight_surf.set_alpha(100) # Make it transparent
 
     def draw(self, surface:Surf, current_money:int):
@@ -214,11 +837,12 @@ class Button(Clickable):
         else:
             price_color = EXPENSIVE
 
-        text = self.font.render(f"${self.type.cost}", True, price_color)
+        text = render_text(self.font, f"${self.type.cost}", price_color)
         
         # Center the text below the button
         text_rect = text.get_rect(center=(self.rect.centerx, self.rect.bottom + 12))
         surface.blit(text, text_rect)
+        return self.rect.union(text_rect) # The area of the screen we drew on
 
 class Sprite(pygame.sprite.Sprite):
     def __init__(self, x: int, y: int, size: tuple[int,int]|int, image_name: str|None = None, colour = FALLBACK):
@@ -234,8 +858,14 @@ class Sprite(pygame.sprite.Sprite):
             self.image = load_colour_surface(FALLBACK, size)
         self.rect = self.image.get_rect(x=x, y=y)
         self.center_pos = Vector2(self.rect.center)
-    def draw(self, screen:Surf):
-        screen.blit(self.image, self.rect)
+        self.last_center = self.rect.center # Where we were before the last move (for draw_smooth)
+    def draw(self, screen:Surf) -> pygame.Rect:
+        return screen.blit(self.image, self.rect)
+    def draw_smooth(self, screen:Surf, alpha:float) -> pygame.Rect:
+        """ Draws part way between last_center and where we are now (alpha: 0.0 - 1.0) """
+        (last_x, last_y), (x, y) = self.last_center, self.rect.center
+        center = (int(last_x + (x - last_x) * alpha), int(last_y + (y - last_y) * alpha))
+        return screen.blit(self.image, self.image.get_rect(center=center))
 class Tile(Sprite):
     def __init__(self, col:int, row:int, type:str, BLOCK_SIZE:int, image_name="", colour:Colour=FALLBACK):
         self.col = col
@@ -243,15 +873,29 @@ class Tile(Sprite):
         self.type = type
         self.tower = None 
         super().__init__(col*BLOCK_SIZE, row*BLOCK_SIZE, BLOCK_SIZE, image_name, colour)
-    def draw(self, screen:Surf):
-        super().draw(screen)
+    def draw(self, screen:Surf) -> pygame.Rect:
+        rect = super().draw(screen)
         if GRID_LINES: # Optional Gridlines
             pygame.draw.rect(screen, (50, 50, 50), self.rect, 1)
+        return rect
     def can_place(self, tower_type:TowerType):
         if self.type not in tower_type.valid_tiles or \
             self.tower is not None:
             return False
         return True
+def changed_rects(old:list[pygame.Rect], new:list[pygame.Rect]) -> list[pygame.Rect]:
+    """ Returns the rects that are only in one list (things that moved, appeared or disappeared) """
+    old_set = {tuple(rect) for rect in old}
+    new_set = {tuple(rect) for rect in new}
+    return [pygame.Rect(rect) for rect in old_set ^ new_set]
+def bake_tiles(grid:list[list[Tile]], size:tuple[int,int], background:Colour=(0,0,0)) -> Surf:
+    """ Draws every Tile onto one Surface. The map doesn't move, so it only needs drawing once """
+    surf = pygame.Surface(size)
+    surf.fill(background)
+    for row in grid:
+        for tile in row:
+            tile.draw(surf)
+    return surf
 class BaseTower(Sprite, Clickable):
     level: int
     type: TowerType
@@ -265,7 +909,7 @@ class BaseTower(Sprite, Clickable):
         Clickable.__init__(self, self.rect)
     def update(self, mouse_pos:Pos):
         Clickable.update(self, mouse_pos)
-    def draw_range(self, screen:Surf, colour = RANGE):
+    def draw_range(self, screen:Surf, colour = RANGE) -> pygame.Rect:
         radius = getattr(self, "range", 0)
         center = self.center_pos
         # Create rect around circle
@@ -275,10 +919,8 @@ class BaseTower(Sprite, Clickable):
             radius * 2,          # Width
             radius * 2           # Height
         )
-        # Draw circle on transparent surface
-        shape_surf = pygame.Surface(target_rect.size, pygame.SRCALPHA)
-        pygame.draw.circle(shape_surf, colour, (radius, radius), radius)
-        screen.blit(shape_surf, target_rect)
+        # Draw circle (on a transparent surface, re-used while the range stays the same)
+        return screen.blit(load_range_circle(radius, colour), target_rect)
     
     # @Property: For UI interaction
     @property
@@ -316,21 +958,40 @@ class UIManager:
     def __init__(self, x:int, y:int, width:int, height:int):
         self.font: pygame.font.Font = None # type: ignore
         self.rect = pygame.Rect(x, y, width, height)
-        pass
+        self.last_state = None # What we looked like last time draw_dirty() drew us
+        self.info_panel: Surf|None = None # The info panel, drawn once and re-used (see draw_info_panel)
+        self.info_panel_key = None # What was on it
 
     def is_clicked(self, pos:Pos): return self.rect.collidepoint(pos)
     def update(self) -> bool: return True
     def draw(self, screen:Surf): pass
     def click(self, pos:Pos): pass
 
-    def draw_text(self, screen:Surf, text:str, pos:Pos, colour:Colour=TEXT, center=False):
-        """ Draws text relative to the System's position. 'pos' is a tuple (x, y) """
-        if self.font is None: #Safety Check: Ensures Font exists
+    # --- Dirty Rectangle Drawing (Optional) ---
+    def get_draw_state(self):
+        """ Returns anything that changes how this section looks. None = always redraw.
+        Can also be a dict of {(x, y, width, height): what's drawn there}, so only the parts that changed are reported """
+        return None
+    def draw_dirty(self, screen:Surf) -> list[pygame.Rect]:
+        """ Only redraws if something changed. Returns the areas of the screen that changed. """
+        state = self.get_draw_state()
+        if state is not None and state == self.last_state:
+            return [] # Nothing changed: skip drawing
+        last_state, self.last_state = self.last_state, state
+        self.draw(screen)
+        if isinstance(state, dict) and isinstance(last_state, dict) and state.keys() == last_state.keys():
+            return [pygame.Rect(area) for area, part in state.items() if part != last_state[area]]
+        return [self.rect]
+
+    def draw_text(self, screen:Surf, text:str, pos:Pos, colour:Colour=TEXT, center=False, font:pygame.font.Font|None=None):
+        """ Draws text relative to the System's position. 'pos' is a tuple (x, y). Uses self.font unless given a font """
+        font = font or self.font
+        if font is None: #Safety Check: Ensures Font exists
             print("Need to create a Font!")
             return
         
-        # Render Text
-        text_surface = self.font.render(str(text), True, colour)
+        # Render Text (or re-use it, if we've drawn the same text before)
+        text_surface = render_text(font, str(text), colour)
         
         # Calculate position on screen (relative to BaseSystem's rect)
         pos = (self.rect.x + pos[0], self.rect.y + pos[1])
@@ -361,8 +1022,19 @@ class UIManager:
             pygame.draw.rect(screen, border_colour, target_rect, border_width)
     
     def draw_info_panel(self, screen:Surf, item, money:int, line_height=25):
+        """ Draws the item's stats. The panel is only re-drawn when something on it changes """
+        can_afford = money >= item.ui_cost
+        # Everything shown on the panel (the upgrade previews follow from the level + stats)
+        key = (id(item), item.ui_title, item.damage, item.range, item.ui_cooldown, item.ui_cost, item.ui_footer, can_afford, line_height)
+        if key != self.info_panel_key:
+            self.info_panel_key = key
+            self.info_panel = self.render_info_panel(item, can_afford, line_height)
+        screen.blit(self.info_panel, (self.rect.x + self.INFO_RECT.x, self.rect.y + self.INFO_RECT.y))
+
+    def render_info_panel(self, item, can_afford:bool, line_height=25) -> Surf:
+        """ Draws the info panel onto its own Surface (positions are relative to the panel) """
         # Determine cost color
-        if money >= item.ui_cost: 
+        if can_afford: 
             cost_col = AFFORDABLE 
         else: 
             cost_col = EXPENSIVE
@@ -390,16 +1062,14 @@ class UIManager:
         
         # Draw Background & Border
         # We use the item's color for the border so it matches the tower
-        
-        self.draw_rect(screen, self.INFO_RECT, 
-                       fill_colour=INFO_PANEL, 
-                       border_colour=tower_colour, 
-                       border_width=2) 
+        panel = pygame.Surface(self.INFO_RECT.size)
+        panel.fill(INFO_PANEL)
+        pygame.draw.rect(panel, tower_colour, panel.get_rect(), 2)
         
         # Draw Text, line by Line 
         # We start drawing text slightly inside the box (+10 padding)
-        current_y = self.INFO_RECT.y + 10 
-        text_x = self.INFO_RECT.x + 10
+        current_y = 10 
+        text_x = 10
         
         for line in data:
             # Access attributes using dot notation (.padding, .text, .color)
@@ -407,71 +1077,162 @@ class UIManager:
             current_y += line.padding
             
             #Draw Main Text
-            self.draw_text(screen, line.text, (text_x, current_y), line.colour)
+            text_surface = render_text(self.font, str(line.text), line.colour)
+            panel.blit(text_surface, (text_x, current_y))
             
             # Draw Upgrade Previews (with Green Arrow)
             # If there is a 'next_val', we draw it to the right
             if line.next_value is not None:
-                width, _ = self.font.size(str(line.text))
+                width = text_surface.get_width()
                 
                 # Draw the arrow and new value in Green
                 arrow_pos = (text_x + width, current_y)
-                self.draw_text(screen, f" -> {line.next_value}", arrow_pos, UPGRADE)
+                panel.blit(render_text(self.font, f" -> {line.next_value}", UPGRADE), arrow_pos)
             current_y += line_height # move down for next line
+        return panel
             
-def sort_path(path_coords: list[tuple[int,int]], 
-    grid_cols: int, grid_rows: int, block_size: int) -> list[Vector2]:
-    """ Sorts the path Coordinates into a sequential list of Vectors. """
+def path_lengths(path:list[Vector2]) -> list[float]:
+    """ Returns the distance from the start of the path to each node (in pixels) """
+    lengths = []
+    total = 0.0
+    for i, node in enumerate(path):
+        if i > 0:
+            total += path[i - 1].distance_to(node)
+        lengths.append(total)
+    return lengths
+
+class PathTrack:
+    """ A path (from sort_path) measured by distance, so 'how far along' is just one number. """
+    def __init__(self, path:list[Vector2]):
+        self.points = path
+        self.lengths = path_lengths(path) # Distance to each node
+        self.total = self.lengths[-1] if path else 0.0
+
+    def segment_at(self, distance:float) -> int:
+        """ Returns the index of the next node at this distance (binary search) """
+        return min(bisect_right(self.lengths, distance), len(self.points) - 1)
+    def position_at(self, distance:float) -> Vector2:
+        """ Returns the pixel position at this distance along the path """
+        i = self.segment_at(distance)
+        if i == 0 or distance >= self.lengths[i]: # Start or end of the path
+            return Vector2(self.points[i])
+        start = self.lengths[i - 1]
+        fraction = (distance - start) / (self.lengths[i] - start)
+        return self.points[i - 1].lerp(self.points[i], fraction)
+
+    def coverage(self, center:Pos, radius:float) -> list[tuple[float,float]]:
+        """ Returns the parts of the path inside a circle, as sorted (start, end) distances """
+        if len(self.points) == 1: # No segments, just the start node
+            return [(0, 0)] if self.points[0].distance_to(center) <= radius else []
+        
+        centre = Vector2(center)
+        intervals = []
+        for i in range(1, len(self.points)):
+            # Solve |start + t*(end - start) - centre| = radius for t (a quadratic)
+            start = self.points[i - 1]
+            direction = self.points[i] - start
+            offset = start - centre
+            a = direction.dot(direction)
+            b = 2 * offset.dot(direction)
+            c = offset.dot(offset) - radius * radius
+            discriminant = b*b - 4*a*c
+            if a == 0 or discriminant < 0:
+                continue # Segment has no length, or the line misses the circle
+            root = discriminant ** 0.5
+            t0 = max(0.0, (-b - root) / (2*a))
+            t1 = min(1.0, (-b + root) / (2*a))
+            if t0 > t1:
+                continue # The circle is beyond one end of this segment
+            
+            # Convert to distances along the path
+            length = self.lengths[i] - self.lengths[i - 1]
+            enter = self.lengths[i - 1] + t0 * length
+            leave = self.lengths[i - 1] + t1 * length
+            # Join onto the previous interval if they touch
+            if intervals and intervals[-1][1] >= enter:
+                intervals[-1] = (intervals[-1][0], leave)
+            else:
+                intervals.append((enter, leave))
+        return intervals
+
+@dataclass
+class PathResult:
+    """ A traced path in grid (col, row) and pixel coordinates, plus any problems found """
+    grid: list[tuple[int,int]]
+    pixels: list[Vector2]
+    problems: list[str] = field(default_factory=list)
+
+def trace_path(path_coords: list[tuple[int,int]], 
+    grid_cols: int, grid_rows: int, block_size: int) -> PathResult:
+    """ Orders the path coordinates from Start -> End in one pass.
+    Branches, loops and gaps are reported in PathResult.problems instead of stopping the game. """
     if not path_coords: 
-        print("Error: No path coordinates found!")
-        return []
-    
-    # Find Start Node
-    start_node = path_coords[0]
+        return PathResult([], [], ["No path coordinates found!"])
+    problems = []
+
+    # Find Start Node: the first path tile on the edge of the map
+    start_node = None
     for col, row in path_coords:
-        # Now uses the variables passed in, not global ones
         if col == 0 or row == 0 or col == grid_cols - 1 or row == grid_rows - 1:
             start_node = (col, row)
             break
+    if start_node is None:
+        problems.append("Path doesn't touch the edge of the map")
+        start_node = path_coords[0]
 
-    # Start Sorting
-    ordered_path = [start_node]
-    unvisited = set(path_coords)
-    if start_node in unvisited:
-        unvisited.remove(start_node)
-    
-    current = start_node
-    while unvisited:
-        col, row = current
-        neighbors = [
-            (col, row - 1), (col, row + 1), 
-            (col - 1, row), (col + 1, row)
-        ]
-        
-        found_next = False
-        for n in neighbors:
-            if n in unvisited:
-                ordered_path.append(n)
-                unvisited.remove(n)
-                current = n
-                found_next = True
-                break
-        
-        if not found_next:
-            print(f"Path broken at {current}")
-            break
+    # Build the neighbour index once: one byte per tile, with a 1 tile border (so we never go out of bounds)
+    # Tile (col, row) is stored at index (row + 1) * width + (col + 1)
+    width = max(col for col, _ in path_coords) + 3
+    height = max(row for _, row in path_coords) + 3
+    EMPTY, PATH, VISITED = 0, 1, 2
+    tiles = bytearray(width * height)
+    for col, row in path_coords:
+        tiles[(row + 1) * width + col + 1] = PATH
+    neighbours = (-width, width, -1, 1) # Up, Down, Left, Right
 
-    # Convert from tile coords to pixel coords
-    offset = block_size // 2
-    pixel_path = []
+    # Walk the path, one tile at a time
+    current = (start_node[1] + 1) * width + start_node[0] + 1
+    tiles[current] = VISITED
+    ordered = [current]
+    previous = -1
+    while True:
+        next_tile = -1
+        for step in neighbours:
+            n = current + step
+            state = tiles[n]
+            if state == EMPTY:
+                continue
+            if state == PATH:
+                if next_tile == -1:
+                    next_tile = n
+                else: # A second way forward
+                    problems.append(f"Path branches at {_tile_coords(current, width)}")
+            elif n != previous: # Touching an earlier part of the path
+                problems.append(f"Path loops back to {_tile_coords(n, width)} at {_tile_coords(current, width)}")
+        if next_tile == -1:
+            break # End of the path
+        tiles[next_tile] = VISITED
+        previous, current = current, next_tile
+        ordered.append(current)
     
-    for col, row in ordered_path:
-        # Use the block_size passed into the function
-        x = (col * block_size) + offset
-        y = (row * block_size) + offset
-        # We assume Vector2 is imported in TowerBase, or use pygame.math.Vector2
-        pixel_path.append(pygame.math.Vector2(x, y))
-        
-    return pixel_path
+    missed = len(path_coords) - len(ordered)
+    if missed:
+        problems.append(f"Path broken at {_tile_coords(current, width)}: {missed} tiles not reached")
 
+    # Convert to tile coords and pixel coords (the centre of each tile)
+    grid_path = [(i % width - 1, i // width - 1) for i in ordered]
+    offset = block_size // 2
+    pixel_path = [Vector2(col * block_size + offset, row * block_size + offset) for col, row in grid_path]
+    return PathResult(grid_path, pixel_path, problems)
+def _tile_coords(index:int, width:int) -> tuple[int,int]:
+    """ Turns a trace_path index back into (col, row) """
+    row, col = divmod(index, width)
+    return (col - 1, row - 1)
 
+def sort_path(path_coords: list[tuple[int,int]], 
+    grid_cols: int, grid_rows: int, block_size: int) -> list[Vector2]:
+    """ Sorts the path Coordinates into a sequential list of Vectors. """
+    result = trace_path(path_coords, grid_cols, grid_rows, block_size)
+    for problem in result.problems:
+        print(f"Error: {problem}")
+    return result.pixels
@@ -0,0 +1,2 @@
+""" Benchmarks for the Tower Defence engine (TowerBase) and the finished game (Lesson 14).
+Run one with:  python -m benchmarks.<name> """
@@ -0,0 +1,179 @@
+""" Times the finished game (Lesson 14) on fixed scenarios, measuring the simulation and the renderer separately.
+Results are saved as JSON, so runs on different commits can be compared.
+Run with:  python -m benchmarks.bench_game [--out results.json] [--compare old.json] [--batch | --batch-compare] [scenarios...]
+
+Each scenario is measured three times, each from a fresh copy built with the same seed:
+    simulation: ticks per second (and ms per tick) of GameManager.update
+    render:     ms per frame to draw the map and sidebar (one untimed update between frames)
+    memory:     the simulation again under tracemalloc: peak and leftover memory, plus garbage collections
+                (each collection ~ 700 new objects, so this tracks how much the game allocates)
+--batch-compare also times each scenario's simulation with and without BATCH_MOVEMENT (NumPy) """
+import argparse, contextlib, gc, json, os, platform, statistics, subprocess, sys, time, tracemalloc
+import pygame
+from tools import load_game, REPO_FOLDER
+
+game = load_game()
+SEED = 1 # Same seed = same game every run
+
+def build_towers(manager, tower_key:str, count:int):
+    """ Builds 'count' towers on the buildable tiles closest to the path """
+    path_tiles = [(col, row) for row, line in enumerate(manager.grid) for col, tile in enumerate(line) if tile.type == "P"]
+    tower_type = game.TOWERS[tower_key]
+    spots = [(col, row) for row, line in enumerate(manager.grid) for col, tile in enumerate(line) if tile.can_place(tower_type)]
+    spots.sort(key=lambda spot: min(abs(spot[0] - col) + abs(spot[1] - row) for col, row in path_tiles))
+    manager.money = 10**9 # Towers are free in benchmarks
+    manager.select_type(tower_type)
+    for col, row in spots[:count]:
+        manager.click_tile(col, row)
+
+def add_enemies(manager, count:int, hp:int):
+    """ Spreads 'count' enemies evenly along the first 80% of the path """
+    for i in range(count):
+        manager.create_enemy(hp, game.ENEMY_SPEED, game.ENEMY_BOUNTY, manager.track.total * 0.8 * i / count)
+    manager.enemy_order.update(manager.enemies, key=lambda enemy: enemy.progress)
+
+def crowded():
+    """ LEVEL_MAP with 50 Archer Towers and 2,000 tough enemies """
+    manager = game.GameManager(game.LEVEL_MAP, seed=SEED)
+    build_towers(manager, "Archer", 50)
+    add_enemies(manager, 2000, hp=10**6)
+    return manager
+
+def rapid_only():
+    """ New_Level with a Rapid Tower on every tile beside the path, against 500 normal enemies """
+    manager = game.GameManager(game.New_Level, seed=SEED)
+    build_towers(manager, "Rapid", 10**6)
+    add_enemies(manager, 500, hp=game.ENEMY_HP)
+    return manager
+
+def horde():
+    """ LEVEL_MAP with 5,000 tough enemies and no towers (mostly measures moving enemies) """
+    manager = game.GameManager(game.LEVEL_MAP, seed=SEED)
+    add_enemies(manager, 5000, hp=10**6)
+    return manager
+
+def empty():
+    """ New_Level with nothing on it (mostly measures drawing the map and sidebar) """
+    return game.GameManager(game.New_Level, seed=SEED)
+
+SCENARIOS = {"crowded": crowded, "rapid_only": rapid_only, "horde": horde, "empty": empty}
+
+def build(scenario:str):
+    manager = SCENARIOS[scenario]()
+    manager.lives = 10**6 # Never game over mid-benchmark
+    return manager
+
+def bench_simulation(scenario:str, ticks:int) -> dict:
+    manager = build(scenario)
+    start = time.perf_counter()
+    for _ in range(ticks):
+        manager.update(game.OFF_SCREEN)
+    seconds = time.perf_counter() - start
+    return {"ticks": ticks, "ticks_per_sec": round(ticks / seconds, 1), "ms_per_tick": round(seconds * 1000 / ticks, 4),
+            "enemies_at_end": len(manager.enemies), "towers": len(manager.towers)}
+
+def bench_render(scenario:str, frames:int) -> dict:
+    manager = build(scenario)
+    interface = game.Interface(manager)
+    screen = pygame.Surface((game.MAP_WIDTH + game.UI_WIDTH, game.MAP_HEIGHT))
+    times = []
+    for _ in range(frames):
+        manager.update(game.OFF_SCREEN) # Something new to draw each frame
+        start = time.perf_counter()
+        screen.fill(game.BG_COLOR)
+        manager.draw(screen)
+        interface.draw(screen)
+        times.append((time.perf_counter() - start) * 1000)
+    times.sort()
+    return {"frames": frames, "ms_mean": round(statistics.fmean(times), 4), "ms_p50": round(times[len(times) // 2], 4),
+            "ms_p95": round(times[int(len(times) * 0.95)], 4), "fps": round(1000 / statistics.fmean(times), 1)}
+
+def bench_memory(scenario:str, ticks:int) -> dict:
+    manager = build(scenario)
+    gc.collect()
+    collections = sum(generation["collections"] for generation in gc.get_stats())
+    tracemalloc.start()
+    for _ in range(ticks):
+        manager.update(game.OFF_SCREEN)
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"ticks": ticks, "peak_kb": round(peak / 1024, 1), "retained_kb": round(current / 1024, 1),
+            "gc_collections": sum(generation["collections"] for generation in gc.get_stats()) - collections}
+
+def compare_batch(scenarios:list[str], ticks:int) -> dict:
+    """ Times each scenario's simulation one enemy at a time, then with NumPy (BATCH_MOVEMENT) """
+    comparison = {}
+    batch_movement = game.BATCH_MOVEMENT
+    for scenario in scenarios:
+        times = {}
+        for mode, batch in (("scalar", False), ("batch", True)):
+            game.BATCH_MOVEMENT = batch
+            with contextlib.redirect_stdout(None):
+                times[mode] = bench_simulation(scenario, ticks)["ms_per_tick"]
+        comparison[scenario] = {"scalar_ms_per_tick": times["scalar"], "batch_ms_per_tick": times["batch"],
+                                "speed_up": round(times["scalar"] / times["batch"], 2)}
+        print(f"{scenario:<12} {times['scalar']:>8.2f} ms/tick one at a time {times['batch']:>8.2f} ms/tick batched"
+              f" {comparison[scenario]['speed_up']:>6.2f}x")
+    game.BATCH_MOVEMENT = batch_movement
+    return comparison
+
+def git_commit() -> str|None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_FOLDER,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run(scenarios:list[str], ticks=600, frames=300) -> dict:
+    results = {"commit": git_commit(), "python": platform.python_version(), "pygame": pygame.version.ver,
+               "batch_movement": game.BATCH_MOVEMENT, "ticks": ticks, "frames": frames, "scenarios": {}}
+    for scenario in scenarios:
+        with contextlib.redirect_stdout(None): # Hide the game's print() messages
+            results["scenarios"][scenario] = {
+                "simulation": bench_simulation(scenario, ticks),
+                "render": bench_render(scenario, frames),
+                "memory": bench_memory(scenario, ticks)}
+        result = results["scenarios"][scenario]
+        print(f"{scenario:<12} {result['simulation']['ticks_per_sec']:>10.0f} ticks/s"
+              f" {result['render']['ms_mean']:>8.2f} ms/frame {result['memory']['peak_kb']:>9.0f} KB peak"
+              f" {result['memory']['gc_collections']:>5} GCs")
+    return results
+
+def compare(old:dict, new:dict):
+    """ Prints how each scenario changed (>1.00x = faster now) """
+    print(f"Compared with {old.get('commit')}:")
+    for scenario, result in new["scenarios"].items():
+        if scenario not in old["scenarios"]:
+            continue
+        before = old["scenarios"][scenario]
+        simulation = result["simulation"]["ticks_per_sec"] / before["simulation"]["ticks_per_sec"]
+        render = before["render"]["ms_mean"] / result["render"]["ms_mean"]
+        print(f"{scenario:<12} simulation {simulation:.2f}x  render {render:.2f}x")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Game simulation and rendering benchmarks")
+    parser.add_argument("scenarios", nargs="*", default=list(SCENARIOS), help=f"Any of: {', '.join(SCENARIOS)}")
+    parser.add_argument("--out", default="benchmark_results.json")
+    parser.add_argument("--compare", help="An older results file to compare against")
+    parser.add_argument("--ticks", type=int, default=600)
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--batch", action="store_true", help="Move enemies with NumPy (BATCH_MOVEMENT)")
+    parser.add_argument("--batch-compare", action="store_true", help="Also time the simulation with and without --batch")
+    args = parser.parse_args()
+    for scenario in args.scenarios:
+        if scenario not in SCENARIOS:
+            parser.error(f"unknown scenario {scenario!r} (choose from {', '.join(SCENARIOS)})")
+    if args.batch_compare and not game.HAS_NUMPY:
+        parser.error("--batch-compare needs NumPy")
+    game.BATCH_MOVEMENT = args.batch
+
+    results = run(args.scenarios, args.ticks, args.frames)
+    if args.batch_compare:
+        results["batch_comparison"] = compare_batch(args.scenarios, args.ticks)
+    with open(args.out, "w") as file:
+        json.dump(results, file, indent=2)
+    print(f"Saved to {os.path.abspath(args.out)}")
+    if args.compare:
+        with open(args.compare) as file:
+            compare(json.load(file), results)
+    sys.exit()
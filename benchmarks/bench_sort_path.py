@@ -0,0 +1,71 @@
+""" Compares trace_path/sort_path against the original step-by-step sort_path on large maps.
+Run with:  python -m benchmarks.bench_sort_path [sizes...]   (e.g. 50 200 500) """
+import sys, timeit
+import pygame
+from TowerBase import sort_path, trace_path
+
+Vector2 = pygame.math.Vector2
+BLOCK_SIZE = 30
+
+def legacy_sort_path(path_coords: list[tuple[int,int]], 
+    grid_cols: int, grid_rows: int, block_size: int) -> list[Vector2]:
+    """ The original sort_path (kept here to compare against) """
+    if not path_coords: 
+        return []
+    start_node = path_coords[0]
+    for col, row in path_coords:
+        if col == 0 or row == 0 or col == grid_cols - 1 or row == grid_rows - 1:
+            start_node = (col, row)
+            break
+    ordered_path = [start_node]
+    unvisited = set(path_coords)
+    if start_node in unvisited:
+        unvisited.remove(start_node)
+    current = start_node
+    while unvisited:
+        col, row = current
+        neighbors = [
+            (col, row - 1), (col, row + 1), 
+            (col - 1, row), (col + 1, row)
+        ]
+        found_next = False
+        for n in neighbors:
+            if n in unvisited:
+                ordered_path.append(n)
+                unvisited.remove(n)
+                current = n
+                found_next = True
+                break
+        if not found_next:
+            break
+    offset = block_size // 2
+    return [Vector2(col * block_size + offset, row * block_size + offset) for col, row in ordered_path]
+
+def serpentine_map(size:int) -> list[str]:
+    """ A size x size map where the path snakes left/right down every other row """
+    rows = []
+    for row in range(size):
+        if row % 2 == 0: # Full row of path
+            rows.append("P" * size)
+        elif row % 4 == 1: # Connector on the right
+            rows.append("T" * (size - 1) + "P")
+        else: # Connector on the left
+            rows.append("P" + "T" * (size - 1))
+    return rows
+
+def path_coords(map_data:list[str]) -> list[tuple[int,int]]:
+    return [(col, row) for row, line in enumerate(map_data) for col, key in enumerate(line) if key == "P"]
+
+def run(sizes:list[int], repeats=5):
+    print(f"{'size':>6} {'tiles':>8} {'legacy (ms)':>12} {'trace_path (ms)':>16} {'speed-up':>9}")
+    for size in sizes:
+        coords = path_coords(serpentine_map(size))
+        # Both versions must agree before we compare their speed
+        assert legacy_sort_path(coords, size, size, BLOCK_SIZE) == sort_path(coords, size, size, BLOCK_SIZE)
+
+        legacy = min(timeit.repeat(lambda: legacy_sort_path(coords, size, size, BLOCK_SIZE), number=1, repeat=repeats))
+        new = min(timeit.repeat(lambda: trace_path(coords, size, size, BLOCK_SIZE), number=1, repeat=repeats))
+        print(f"{size:>6} {len(coords):>8} {legacy * 1000:>12.2f} {new * 1000:>16.2f} {legacy / new:>8.2f}x")
+
+if __name__ == "__main__":
+    run([int(arg) for arg in sys.argv[1:]] or [50, 200, 500])
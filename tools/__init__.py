@@ -0,0 +1,17 @@
+""" Developer tools for the finished game (Lesson 14): balance sweeps, checks of the saved file formats and helpers.
+These run the game headless, so no window opens. """
+import os, sys, importlib.util
+
+REPO_FOLDER = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LESSON_14 = os.path.join(REPO_FOLDER, "Lesson_14 - Optional.py")
+
+def load_game(path:str = LESSON_14):
+    """ Imports the finished game as a module, headless (no window opens and main() doesn't run), and loads its images """
+    os.environ["TD_HEADLESS"] = "1"
+    if REPO_FOLDER not in sys.path: # So the game can find TowerBase
+        sys.path.insert(0, REPO_FOLDER)
+    spec = importlib.util.spec_from_file_location("lesson_14", path)
+    module = importlib.util.module_from_spec(spec) # type: ignore
+    spec.loader.exec_module(module) # type: ignore
+    module.load_assets()
+    return module
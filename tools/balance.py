@@ -0,0 +1,135 @@
+""" Runs many headless games in parallel to test tower and difficulty balance.
+
+    python -m tools.balance tools/example_sweep.json --out results.csv [--workers 8]
+
+The sweep file (JSON) lists the values to try. Every combination is played once:
+    "towers":   {tower key: {TowerType field: [values...]}}   e.g. {"Archer": {"damage": [10, 15]}}
+    "settings": {game setting: [values...]}                   e.g. {"ENEMY_HP_INCREASE": [5, 10]}
+    "maps":     [names of maps in the game]                   e.g. ["New_Level", "LEVEL_MAP"]
+    "builds":   {name: [[tick, tower key, col, row], ...]}    build orders (clicking a built tile upgrades it)
+    "max_ticks", "sample_every": game length, and how often to record money (in ticks)
+Results are written (one row per game, as soon as it finishes) to CSV, or JSON lines if --out ends in .jsonl
+"""
+import argparse, csv, dataclasses, itertools, json, os, sys, time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from tools import load_game
+
+game = None # The game module, loaded once per worker process
+original_towers = {}
+
+def start_worker():
+    global game, original_towers
+    game = load_game()
+    original_towers = dict(game.TOWERS)
+
+def expand_sweep(sweep:dict) -> list[dict]:
+    """ Turns the sweep file into one config per combination of values """
+    options = [] # (kind, name, field, values)
+    for tower_key, fields in sweep.get("towers", {}).items():
+        for field, values in fields.items():
+            options.append(("tower", tower_key, field, values))
+    for setting, values in sweep.get("settings", {}).items():
+        options.append(("setting", setting, None, values))
+    maps = sweep.get("maps", ["New_Level"])
+    builds = sweep.get("builds", {"none": []})
+
+    configs = []
+    for map_name, build_name in itertools.product(maps, builds):
+        for values in itertools.product(*(option[3] for option in options)):
+            config = {"map": map_name, "build": build_name, "build_order": builds[build_name],
+                      "towers": {}, "settings": {},
+                      "max_ticks": sweep.get("max_ticks", 60 * 60 * 10),
+                      "sample_every": sweep.get("sample_every", 600)}
+            for (kind, name, field, _), value in zip(options, values):
+                if kind == "tower":
+                    config["towers"].setdefault(name, {})[field] = value
+                else:
+                    config["settings"][name] = value
+            configs.append(config)
+    return configs
+
+def run_config(config:dict) -> dict:
+    """ Plays one headless game with the config's changes (runs in a worker process) """
+    # Apply this config's changes (and undo the last one's)
+    game.TOWERS.clear()
+    game.TOWERS.update(original_towers)
+    for tower_key, fields in config["towers"].items():
+        game.TOWERS[tower_key] = dataclasses.replace(original_towers[tower_key], **fields)
+    saved_settings = {name: getattr(game, name) for name in config["settings"]}
+    for name, value in config["settings"].items():
+        setattr(game, name, value)
+
+    build_order = list(config["build_order"])
+    money_curve = []
+    def on_tick(manager, tick):
+        # Build the next tower once it's time and we can afford it
+        while build_order and build_order[0][0] <= tick:
+            _, tower_key, col, row = build_order[0]
+            tower_type = game.TOWERS[tower_key]
+            tile = manager.grid[row][col]
+            cost = tile.tower.get_upgrade_cost() if tile.tower else tower_type.cost
+            if manager.money < cost:
+                break # Wait until we can afford it
+            manager.select_type(tower_type)
+            manager.click_tile(col, row)
+            build_order.pop(0)
+        if tick % config["sample_every"] == 0:
+            money_curve.append(manager.money)
+
+    try:
+        start = time.perf_counter()
+        manager = game.run_headless(getattr(game, config["map"]), config["max_ticks"], on_tick)
+        seconds = time.perf_counter() - start
+    finally:
+        for name, value in saved_settings.items():
+            setattr(game, name, value)
+
+    game_over = manager.lives <= 0
+    row = {"map": config["map"], "build": config["build"]}
+    for tower_key, fields in config["towers"].items():
+        for field, value in fields.items():
+            row[f"{tower_key}.{field}"] = value
+    row.update(config["settings"])
+    row.update({
+        "waves_survived": manager.spawner.wave_number - (1 if game_over else 0),
+        "game_over": game_over,
+        "lives": manager.lives,
+        "money": manager.money,
+        "towers": len(manager.towers),
+        "ticks": manager.tick,
+        "ticks_per_sec": round(manager.tick / max(seconds, 1e-9)),
+        "money_curve": " ".join(str(money) for money in money_curve),
+    })
+    return row
+
+def run_sweep(sweep:dict, out_path:str, workers:int|None = None):
+    configs = expand_sweep(sweep)
+    print(f"Running {len(configs)} games on {workers or os.cpu_count()} processes -> {out_path}")
+    as_json = out_path.endswith(".jsonl")
+    start = time.perf_counter()
+    with open(out_path, "w", newline="") as file, \
+        ProcessPoolExecutor(max_workers=workers, initializer=start_worker) as pool:
+        writer = None
+        futures = [pool.submit(run_config, config) for config in configs]
+        for done, future in enumerate(as_completed(futures), 1):
+            row = future.result()
+            if as_json:
+                file.write(json.dumps(row) + "\n")
+            else:
+                if writer is None: # Every row has the same columns
+                    writer = csv.DictWriter(file, fieldnames=list(row))
+                    writer.writeheader()
+                writer.writerow(row)
+            file.flush() # Stream: results are readable while the sweep runs
+            if done % 50 == 0 or done == len(futures):
+                print(f"{done}/{len(futures)} games ({time.perf_counter() - start:.1f}s)")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Parallel headless balance sweeps")
+    parser.add_argument("sweep", help="JSON sweep file")
+    parser.add_argument("--out", default="balance_results.csv", help=".csv or .jsonl")
+    parser.add_argument("--workers", type=int, default=None, help="Processes (default: one per CPU)")
+    args = parser.parse_args()
+    with open(args.sweep) as file:
+        run_sweep(json.load(file), args.out, args.workers)
+    sys.exit()
@@ -0,0 +1,172 @@
+""" Checks the files the game saves to disk can still be read back: replays (ReplayLog) and saved sprite atlases (SpriteAtlas).
+
+    python -m tools.check_formats
+
+Each check runs in its own empty temporary folder. Prints PASS/FAIL for each, and exits with
+an error code if any failed, so it can be run before committing a change to these formats.
+"""
+import os, sys, tempfile, traceback
+import pygame
+from tools import load_game
+
+game = load_game()
+from TowerBase import ReplayLog, SpriteAtlas # After load_game(), which lets Python find TowerBase
+
+# --- Replays ---
+def check_replay_round_trip(folder:str):
+    """ Everything saved is loaded back unchanged """
+    log = ReplayLog(game.New_Level, seed=123456789)
+    log.add(0, ReplayLog.SELECT, 1)
+    log.add(5, ReplayLog.CLICK, 2, 0)
+    log.add(2**32 - 1, ReplayLog.END, -500, 2**31 - 1) # Biggest tick, negative money
+    path = f"{folder}/game.tdr"
+    log.save(path)
+    loaded = ReplayLog.load(path)
+    assert loaded.map_data == list(game.New_Level), "map changed"
+    assert loaded.seed == log.seed, f"seed {loaded.seed} != {log.seed}"
+    assert loaded.events == log.events, f"events {loaded.events} != {log.events}"
+
+def check_replay_rejects_other_files(folder:str):
+    """ Files that aren't (this version of) a replay raise ValueError, instead of replaying nonsense """
+    path = f"{folder}/game.tdr"
+    ReplayLog(game.New_Level).save(path)
+    with open(path, "rb") as file:
+        data = file.read()
+    for name, changed in (("magic", b"XXXX" + data[4:]), ("version", data[:4] + bytes([ReplayLog.VERSION + 1]) + data[5:])):
+        with open(path, "wb") as file:
+            file.write(changed)
+        try:
+            ReplayLog.load(path)
+        except ValueError:
+            continue
+        raise AssertionError(f"loaded a replay with the wrong {name}")
+
+def check_replay_replays_game(folder:str):
+    """ A recorded headless game plays back to the same tick, money and lives """
+    towers = list(game.TOWERS.values())
+    def build(manager, tick):
+        if tick == 10:
+            manager.select_type(towers[0])
+            manager.click_tile(2, 0)
+        elif tick == 600:
+            manager.select_type(towers[-1])
+            manager.click_tile(4, 2)
+            manager.click_tile(2, 0) # Upgrade the first tower
+    manager = game.run_headless(game.New_Level, max_ticks=3000, on_tick=build, seed=7)
+    assert len(manager.towers) == 2, f"built {len(manager.towers)} towers, not 2 (nothing worth replaying)"
+    path = f"{folder}/game.tdr"
+    manager.save_replay(path)
+    _, differences = game.run_replay(path)
+    assert not differences, "; ".join(differences)
+
+# --- Sprite Atlases ---
+ATLAS_SIZE = (16, 16)
+
+def make_images(folder:str, colours:dict[str, tuple]) -> str:
+    """ Saves a small PNG of each colour (filename -> colour) in folder/images. Returns that folder """
+    images = os.path.join(folder, "images")
+    os.makedirs(images, exist_ok=True)
+    for filename, colour in colours.items():
+        image = pygame.Surface((8, 8), pygame.SRCALPHA)
+        image.fill(colour)
+        pygame.image.save(image, os.path.join(images, filename))
+    return images
+def save_atlas(images:str, cache:str) -> SpriteAtlas:
+    atlas = SpriteAtlas.build(images, ATLAS_SIZE)
+    atlas.save(cache, SpriteAtlas.list_images(images))
+    return atlas
+def pixels(atlas:SpriteAtlas) -> dict[str, bytes]:
+    return {name: pygame.image.tobytes(image, "RGBA") for name, image in atlas.images.items()}
+
+def check_atlas_round_trip(folder:str):
+    """ A saved atlas loads back with the same images, in the same places, with the same pixels """
+    images = make_images(folder, {"a.png": (255, 0, 0, 255), "b.png": (0, 255, 0, 128), "c.png": (0, 0, 255, 0)})
+    cache = os.path.join(folder, "cache")
+    built = save_atlas(images, cache)
+    loaded = SpriteAtlas.load(cache, ATLAS_SIZE, SpriteAtlas.list_images(images))
+    assert loaded is not None, "the atlas that was just saved didn't load"
+    assert loaded.positions == built.positions, f"positions {loaded.positions} != {built.positions}"
+    assert pixels(loaded) == pixels(built), "pixels changed"
+
+def check_atlas_out_of_date(folder:str):
+    """ After any image is changed, added or removed, the saved atlas isn't used """
+    images = make_images(folder, {"a.png": (255, 0, 0, 255), "b.png": (0, 255, 0, 255)})
+    cache = os.path.join(folder, "cache")
+    path = os.path.join(images, "a.png")
+    def touch(): # Same file, newer modified time
+        info = os.stat(path)
+        os.utime(path, ns=(info.st_atime_ns, info.st_mtime_ns + 10**9))
+    def resize(): # Same modified time, different file size
+        info = os.stat(path)
+        pygame.image.save(pygame.Surface((32, 32)), path)
+        os.utime(path, ns=(info.st_atime_ns, info.st_mtime_ns))
+    def add(): make_images(folder, {"new.png": (255, 255, 255, 255)})
+    def remove(): os.remove(os.path.join(images, "b.png"))
+    for change in (touch, resize, add, remove):
+        save_atlas(images, cache)
+        change()
+        assert SpriteAtlas.load(cache, ATLAS_SIZE, SpriteAtlas.list_images(images)) is None, f"loaded after {change.__name__}()"
+    assert SpriteAtlas.load(cache, (32, 32), SpriteAtlas.list_images(images)) is None, "loaded at a size that wasn't saved"
+
+def check_atlas_half_saved(folder:str):
+    """ Missing, broken or mismatched files are ignored (the atlas is rebuilt), instead of crashing """
+    images = make_images(folder, {"a.png": (255, 0, 0, 255), "b.png": (0, 255, 0, 255)})
+    cache = os.path.join(folder, "cache")
+    sources = SpriteAtlas.list_images(images)
+    pixels_path, index_path = SpriteAtlas.cache_paths(cache, ATLAS_SIZE)
+    def truncate_pixels():
+        with open(pixels_path, "r+b") as file:
+            file.truncate(os.path.getsize(pixels_path) // 2)
+    def grow_pixels(): # e.g. from a bigger atlas than the index describes
+        with open(pixels_path, "ab") as file:
+            file.write(bytes(64))
+    def empty_pixels(): open(pixels_path, "wb").close()
+    def remove_pixels(): os.remove(pixels_path)
+    def remove_index(): os.remove(index_path)
+    def break_index():
+        with open(index_path, "w") as file:
+            file.write("{not json")
+    for change in (truncate_pixels, grow_pixels, empty_pixels, remove_pixels, remove_index, break_index):
+        save_atlas(images, cache)
+        change()
+        assert SpriteAtlas.load(cache, ATLAS_SIZE, sources) is None, f"loaded after {change.__name__}()"
+
+def check_atlas_resave_while_loaded(folder:str):
+    """ Saving a new atlas doesn't change (or crash) one that is already loaded from the old files """
+    images = make_images(folder, {"a.png": (255, 0, 0, 255), "b.png": (0, 255, 0, 255)})
+    cache = os.path.join(folder, "cache")
+    save_atlas(images, cache)
+    old = SpriteAtlas.load(cache, ATLAS_SIZE, SpriteAtlas.list_images(images))
+    assert old is not None, "the atlas that was just saved didn't load"
+    old_pixels = pixels(old)
+
+    path = os.path.join(images, "a.png")
+    info = os.stat(path)
+    make_images(folder, {"a.png": (0, 0, 255, 255)}) # Change an image, then save over the old atlas
+    os.utime(path, ns=(info.st_atime_ns, info.st_mtime_ns + 10**9)) # Newer, even if the clock hasn't ticked
+    new = save_atlas(images, cache)
+    pygame.Surface(ATLAS_SIZE).blit(old.images["a.png"], (0, 0)) # Reads the old mapped pixels
+    assert pixels(old) == old_pixels, "the loaded atlas changed when a new one was saved"
+    loaded = SpriteAtlas.load(cache, ATLAS_SIZE, SpriteAtlas.list_images(images))
+    assert loaded is not None and pixels(loaded) == pixels(new), "the new atlas didn't load"
+
+CHECKS = [check_replay_round_trip, check_replay_rejects_other_files, check_replay_replays_game,
+          check_atlas_round_trip, check_atlas_out_of_date, check_atlas_half_saved, check_atlas_resave_while_loaded]
+
+def run_checks() -> bool:
+    """ Runs every check, printing the results. Returns True if they all passed """
+    failed = 0
+    for check in CHECKS:
+        with tempfile.TemporaryDirectory() as folder:
+            try:
+                check(folder)
+                print(f"PASS {check.__name__}")
+            except Exception:
+                failed += 1
+                print(f"FAIL {check.__name__}")
+                traceback.print_exc()
+    print(f"{len(CHECKS) - failed}/{len(CHECKS)} checks passed")
+    return failed == 0
+
+if __name__ == "__main__":
+    sys.exit(0 if run_checks() else 1)